@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Build several dictionaries in one go from a build matrix, instead
+# of running tab2opflinux.py once per dictionary.
+#
+# The matrix is a JSON list of targets (or {"targets": [...]}):
+#   [{"name": "MoToEng", "files": ["MoToEng.txt"],
+#     "source": "mn", "target": "en"},
+#    {"name": "MoToEngPlugin", "files": ["MoToEng.txt"],
+#     "module": "myplugin", "source": "mn", "target": "en"},
+#    {"name": "MoToEngAll", "files": ["MoToEng.txt", "MoToEng2.txt"],
+#     "priority": [2, 1], "conflict": "concat"}]
+#
+# name is the output basename ({name}.opf, {name}N.html) and module,
+# source, target, priority and conflict are as on the command line
+# of tab2opflinux.py.
+#
+# Each file is read once per plugin it is used with, and each
+# target's files are then merged from those reads the way
+# tab2opfhelper.readsources merges them. The morphology doesn't
+# depend on the plugin, so every distinct (key, term, part of
+# speech) of all the targets is then inflected once, on --jobs
+# processes, and the markup is shared by the writers, which run
+# on threads.
+#
+# Usage:
+#   python3 buildmatrix.py [-j JOBS] [-t THREADS] matrix.json
+
+import io
+import sys
+import json
+import time
+import argparse
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
+
+import tab2opfhelper
+from tab2opfhelper import readkeys, rankfiles, mergesources, termgroups, \
+    termpos, inflectterm, writekeys, writeopf, CONFLICTS
+
+def parseargs():
+    parser = argparse.ArgumentParser("buildmatrix")
+    parser.add_argument("-v", "--verbose", help="make verbose",
+                        action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of processes to read and inflect with (all cores by default)")
+    parser.add_argument("-t", "--threads", type=int, default=None,
+                        help="Number of targets written at once (all by default)")
+    parser.add_argument("matrix", help="JSON build matrix")
+    return parser.parse_args()
+
+# The targets of the matrix file, with defaults filled in
+def loadmatrix(fname):
+    with io.open(fname, 'r', encoding='utf-8') as fr:
+        matrix = json.load(fr)
+    if isinstance(matrix, dict): matrix = matrix.get("targets", [])
+
+    targets = []
+    names = set()
+    for t in matrix:
+        if "name" not in t or not t.get("files"):
+            raise ValueError("target needs a name and files: {}".format(t))
+        if t["name"] in names:
+            raise ValueError("two targets named {}".format(t["name"]))
+        names.add(t["name"])
+        if t.get("conflict", "all") not in CONFLICTS:
+            raise ValueError("{}: conflict must be one of {}".format(
+                t["name"], ", ".join(CONFLICTS)))
+        if t.get("priority") is not None and len(t["priority"]) != len(t["files"]):
+            raise ValueError("{}: one priority per file".format(t["name"]))
+        targets.append(dict({"module": None, "source": "en", "target": "en",
+                             "priority": None, "conflict": "all"}, **t))
+    return targets
+
+# What has to be the same for two targets to share a read
+def readspec(t):
+    priority = tuple(t["priority"]) if t["priority"] is not None else None
+    return tuple(t["files"]), t["module"], priority, t["conflict"]
+
+# The (file, module) reads the targets need, grouped by module
+# so each plugin is loaded once
+def filereads(targets):
+    reads = dict.fromkeys((f, t["module"]) for t in targets for f in t["files"])
+    return sorted(reads, key=lambda fm: (fm[1] or "", fm[0]))
+
+# The keys of filename in sorted order, read with module loaded
+def readfile(filename, module, jobs=None):
+    if tab2opfhelper.MODULE != module:
+        tab2opfhelper.MODULE = module
+        tab2opfhelper.importmod()
+    return sorted(readkeys(filename, jobs).items())
+
+# The keys of a readspec, merged from the reads of its files
+# A single file is taken as is, like tab2opflinux.py does
+def specdefns(spec, reads):
+    files, module, priority, conflict = spec
+    if len(files) == 1: return dict(reads[files[0], module])
+    files = rankfiles(list(files), list(priority) if priority else None)
+    return mergesources([reads[f, module] for f in files], conflict)
+
+# Every distinct (key, term, pos) the defns write
+def inflectionitems(defnss):
+    items = {}
+    for defns in defnss:
+        for key, defn in defns.items():
+            for term, g in termgroups(defn):
+                items[key, term, termpos(g)] = None
+    return list(items)
+
+def inflectchunk(items):
+    return [inflectterm(key, term, pos).chain for key, term, pos in items]
+
+# (key, term, pos) -> inflection markup of every item,
+# inflected by jobs processes
+def inflectall(items, jobs=None):
+    chunks = [items[i:i+500] for i in range(0, len(items), 500)]
+    if jobs == 1 or len(chunks) <= 1:
+        chains = map(inflectchunk, chunks)
+        return dict(zip(items, (c for chunk in chains for c in chunk)))
+    with Pool(jobs) as pool:
+        chains = pool.imap(inflectchunk, chunks)
+        return dict(zip(items, (c for chunk in chains for c in chunk)))
+
+# Write one target, returning the seconds it took
+def buildtarget(t, defns, chains):
+    start = time.perf_counter()
+    ndicts = writekeys(defns, t["name"], chains)
+    writeopf(ndicts, t["name"], t["source"], t["target"])
+    return time.perf_counter() - start
+
+def main():
+    args = parseargs()
+    tab2opfhelper.VERBOSE = args.verbose
+    try: targets = loadmatrix(args.matrix)
+    except ValueError as e:
+        print("Bad matrix {}: {}".format(args.matrix, e))
+        sys.exit(2)
+    wall = time.perf_counter()
+
+    reads = {}
+    readtime = {}
+    for filename, module in filereads(targets):
+        print("Reading {}{}".format(filename, " with " + module if module else ""))
+        start = time.perf_counter()
+        reads[filename, module] = readfile(filename, module, args.jobs)
+        readtime[filename, module] = time.perf_counter() - start
+
+    specs = list(dict.fromkeys(readspec(t) for t in targets))
+    start = time.perf_counter()
+    read = {spec: specdefns(spec, reads) for spec in specs}
+    mergetime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    items = inflectionitems(read.values())
+    print("Inflecting {} headwords".format(len(items)))
+    chains = inflectall(items, args.jobs)
+    inflecttime = time.perf_counter() - start
+
+    print("Writing {} targets".format(len(targets)))
+    with ThreadPoolExecutor(args.threads or len(targets)) as ex:
+        futures = [ex.submit(buildtarget, t, read[readspec(t)], chains) for t in targets]
+        writetime = [f.result() for f in futures]
+    wall = time.perf_counter() - wall
+
+    print()
+    print("{:<24} {:>8} {:>8}".format("target", "keys", "write s"))
+    for t, w in zip(targets, writetime):
+        print("{:<24} {:>8} {:>8.2f}".format(t["name"], len(read[readspec(t)]), w))
+    print()
+    for (filename, module), seconds in readtime.items():
+        users = sum(filename in t["files"] and t["module"] == module for t in targets)
+        print("Read {}{} in {:.2f}s, used by {} target(s)".format(
+            filename, " with " + module if module else "", seconds, users))
+    print("Merged {} key sets in {:.2f}s".format(len(specs), mergetime))
+    print("Inflected {} headwords once in {:.2f}s".format(len(items), inflecttime))
+    print("Total {:.2f}s".format(wall))
+
+if __name__ == "__main__":
+    main()
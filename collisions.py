@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Find inflected forms that more than one headword generates.
+#
+# The kindle resolves a lookup of such a form to any of the
+# headwords, so these are worth checking when editing the
+# paradigms in tab2opfhelper.
+#
+# Every (form, headword) pair is hashed into one of --shards
+# temporary files in a single pass over the dictionary, then
+# each shard is indexed on its own as form -> set of headwords.
+# Only one shard is held in memory at a time.
+#
+# Usage:
+#   python3 collisions.py [-m MODULE] [--top 50] MoToEng.txt
+
+import os
+import io
+import sys
+import heapq
+import zlib
+import argparse
+import tempfile
+
+import tab2opfhelper
+from tab2opfhelper import readkeys, termgroups, termpos, inflectterm, iforms
+
+def parseargs():
+    parser = argparse.ArgumentParser("collisions")
+    parser.add_argument("-v", "--verbose", help="make verbose",
+                        action="store_true")
+    parser.add_argument("-m", "--module",
+                        help="Import module for mapping, getkey, getdef")
+    parser.add_argument("-n", "--shards", type=int, default=16,
+                        help="Number of hash shards to spill forms into")
+    parser.add_argument("--top", type=int, default=0,
+                        help="Only report the N most shared forms (0 for all)")
+    parser.add_argument("file", help="tab file to analyze")
+    return parser.parse_args()
+
+# Every form a headword is found under: the key
+# itself and the generated inflections, lower cased
+def headwordforms(key, defn):
+    yield key
+    for term, g in termgroups(defn):
+        for form in iforms(inflectterm(key, term, termpos(g)).chain):
+            yield form.lower()
+
+def shardof(form, nshards):
+    return zlib.crc32(form.encode("utf-8")) % nshards
+
+# Write "form \t key" lines into nshards files under tmpdir
+# Returns the number of pairs written
+def spill(defns, tmpdir, nshards):
+    shards = [io.open(os.path.join(tmpdir, "shard{}.tab".format(i)),
+                      'w', encoding="utf-8")
+              for i in range(nshards)]
+    npairs = 0
+    try:
+        for key, defn in defns.items():
+            for form in set(headwordforms(key, defn)):
+                shards[shardof(form, nshards)].write(form + "\t" + key + "\n")
+                npairs += 1
+    finally:
+        for f in shards: f.close()
+    return npairs
+
+# Read a shard back as form -> set of keys. Returns the number
+# of distinct forms and (number of headwords, form, sorted keys)
+# for the shared forms
+def shardcollisions(fname):
+    index = {}
+    with io.open(fname, 'r', encoding="utf-8") as fr:
+        for line in fr:
+            form, key = line.rstrip("\n").split("\t", 1)
+            index.setdefault(form, set()).add(key)
+    nforms = len(index)
+    collisions = [(len(keys), form, sorted(keys))
+                  for form, keys in index.items() if len(keys) > 1]
+    return nforms, collisions
+
+# Colliding forms over the whole dictionary, the most
+# shared first. top limits how many are kept in memory.
+# Returns (pairs, distinct forms, shared forms, ranked collisions)
+def findcollisions(defns, nshards=16, top=0):
+    with tempfile.TemporaryDirectory(prefix="collisions") as tmpdir:
+        npairs = spill(defns, tmpdir, nshards)
+        nforms = nshared = 0
+        ranked = []
+        for i in range(nshards):
+            n, collisions = shardcollisions(os.path.join(tmpdir, "shard{}.tab".format(i)))
+            nforms += n
+            nshared += len(collisions)
+            if top > 0:
+                ranked = heapq.nsmallest(top, ranked + collisions,
+                                         key=lambda c: (-c[0], c[1]))
+            else:
+                ranked.extend(collisions)
+        ranked.sort(key=lambda c: (-c[0], c[1]))
+        return npairs, nforms, nshared, ranked
+
+def main():
+    args = parseargs()
+    tab2opfhelper.VERBOSE = args.verbose
+    tab2opfhelper.MODULE = args.module
+    tab2opfhelper.importmod()
+
+    print("Reading keys", file=sys.stderr)
+    defns = readkeys(args.file)
+    print("Hashing forms into {} shards".format(args.shards), file=sys.stderr)
+    npairs, nforms, nshared, ranked = findcollisions(defns, args.shards, args.top)
+    print("{} headwords, {} forms, {} distinct, {} shared".format(
+        len(defns), npairs, nforms, nshared), file=sys.stderr)
+
+    for n, form, keys in ranked:
+        print("{}\t{}\t{}".format(n, form, ", ".join(keys)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Word frequencies of a plain text corpus, used by tab2opfhelper
+# --corpus to drop generated inflections that never show up in
+# real text.
+#
+# The corpus is split into byte ranges that end on a newline and
+# each range is counted in its own process, so a large corpus is
+# read on all cores without ever being held in memory whole.
+#
+# Usage (prints the most frequent words):
+#   python3 corpusfreq.py [-j JOBS] [--top 100] corpus.txt
+
+import os
+import re
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+
+from tab2opfhelper import workers
+
+# Letters only: no digits, underscores or punctuation
+WORD = re.compile(r"[^\W\d_]+")
+
+CHUNKSIZE = 16 * 1024 * 1024
+
+# Split fname into (fname, start, end) byte ranges of about
+# chunksize bytes, each ending just after a newline
+def chunks(fname, chunksize=CHUNKSIZE):
+    size = os.path.getsize(fname)
+    ranges = []
+    with open(fname, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunksize, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((fname, start, end))
+            start = end
+    return ranges
+
+# Lower cased word counts of one byte range
+def countchunk(chunk):
+    fname, start, end = chunk
+    with open(fname, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', errors='replace')
+    return Counter(WORD.findall(text.lower()))
+
+# Word counts of the whole corpus, counted by jobs processes
+# (all cores by default); with one process to use, or one
+# chunk, it's counted in this process
+def countcorpus(fname, jobs=None, chunksize=CHUNKSIZE):
+    ranges = chunks(fname, chunksize)
+    counts = Counter()
+    if workers(jobs) == 1 or len(ranges) <= 1:
+        for chunk in ranges: counts.update(countchunk(chunk))
+    else:
+        with Pool(jobs) as pool:
+            for c in pool.imap_unordered(countchunk, ranges):
+                counts.update(c)
+    return counts
+
+def parseargs():
+    parser = argparse.ArgumentParser("corpusfreq")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of processes (all cores by default)")
+    parser.add_argument("--top", type=int, default=100,
+                        help="Number of words to print")
+    parser.add_argument("file", help="plain text corpus")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parseargs()
+    counts = countcorpus(args.file, args.jobs)
+    print("{} tokens, {} words".format(sum(counts.values()), len(counts)))
+    for word, n in counts.most_common(args.top):
+        print("{}\t{}".format(n, word))
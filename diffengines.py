@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Compare the forms two versions of the morphology generate.
+#
+# Both versions are loaded from a file (tab2opfhelper.py in this
+# directory is the baseline by default) and must already have the
+# inflectterm(key, term, pos) and iforms(chain) of tab2opfhelper
+# and build only from main(). The original single script
+# tab2opfhelper.py parsed sys.argv and built the dictionary as it
+# was imported, so it can't be compared against with this.
+# The headwords come from tab files, read with this directory's
+# tab2opfhelper, and/or a synthetic lexicon of made up words.
+#
+# For every headword the forms are compared and reported as added,
+# removed or only reordered, along with the headwords per second
+# and the peak memory of each version. Headwords are split between
+# --jobs processes.
+#
+# Changes that are meant to happen go in an --expect file, one
+# per line, tab separated:
+#   headword<TAB>+form    form is expected to be added
+#   headword<TAB>-form    form is expected to be removed
+#   headword<TAB>~        the order of the forms may change
+#   headword<TAB>*        any change to the headword is expected
+# Lines starting with # are comments. --write-expect writes every
+# difference found in this format, to review and pass back in.
+#
+# Usage:
+#   python3 diffengines.py --candidate ../other/tab2opfhelper.py MoToEng.txt
+#   python3 diffengines.py --candidate new.py --synthetic 20000 --seed 3
+#   python3 diffengines.py --candidate new.py --expect expected.tsv MoToEng.txt
+#
+# Exits with 1 if any forms were added or removed (or reordered,
+# unless --allow-reorder) that the --expect file doesn't list.
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+import importlib.util
+from itertools import islice
+from multiprocessing import Pool
+
+import tab2opfhelper
+from tab2opfhelper import readkeys, termgroups, termpos, workers
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def parseargs():
+    parser = argparse.ArgumentParser("diffengines")
+    parser.add_argument("-b", "--baseline",
+                        default=os.path.join(HERE, "tab2opfhelper.py"),
+                        help="File of the version to compare against")
+    parser.add_argument("-c", "--candidate", required=True,
+                        help="File of the version being tested")
+    parser.add_argument("-m", "--module",
+                        help="Import module for mapping, getkey, getdef")
+    parser.add_argument("-n", "--synthetic", type=int, default=0,
+                        help="Also compare this many made up headwords")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Random seed for --synthetic")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of processes (all cores by default)")
+    parser.add_argument("--allow-reorder", action="store_true",
+                        help="Don't fail when only the order of forms changed")
+    parser.add_argument("-e", "--expect",
+                        help="File of the changes that are meant to happen")
+    parser.add_argument("--write-expect",
+                        help="Write every difference found to this file, in --expect format")
+    parser.add_argument("--show", type=int, default=20,
+                        help="Number of differing headwords to print")
+    parser.add_argument("file", nargs="*", help="tab files to take headwords from")
+    return parser.parse_args()
+
+# Load the tab2opfhelper in path under its own module name
+def loadengine(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    engine = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(engine)
+    return engine
+
+# (key, term, pos) of every term of the tab files
+def sourceitems(filenames):
+    for filename in filenames:
+        for key, defn in sorted(readkeys(filename).items()):
+            for term, g in termgroups(defn):
+                yield key, term, termpos(g)
+
+# Made up words that look enough like Mongolian to go through
+# every branch of the paradigms: both vowel harmonies, long
+# vowels, consonant clusters and verbs in -х
+SYLLABLES = {
+    "masc": ["а", "о", "у", "аа", "оо", "уу", "ай", "уй"],
+    "fem": ["э", "ө", "ү", "ээ", "өө", "үү", "эй", "и"],
+}
+CONSONANTS = "бвгджзлмнрстхцчш"
+POS = ["n.", "adj.", "v.", "adv.", "pron.", None]
+def syntheticitems(n, seed=0):
+    rnd = random.Random(seed)
+    for _ in range(n):
+        vowels = SYLLABLES[rnd.choice(["masc", "fem"])]
+        word = ''.join(rnd.choice(CONSONANTS) + rnd.choice(vowels)
+                       for _ in range(rnd.randint(1, 3)))
+        if rnd.random() < 0.6: word += rnd.choice(CONSONANTS)
+        pos = rnd.choice(POS)
+        if pos == "v." or (pos is None and rnd.random() < 0.5):
+            word = word.rstrip(CONSONANTS) + rnd.choice(vowels) + "х"
+        yield word, word, (pos,) if pos else ()
+
+ENGINES = None
+
+def initworker(baseline, candidate, module):
+    global ENGINES
+    ENGINES = [loadengine("baseline", baseline), loadengine("candidate", candidate)]
+    for engine in [tab2opfhelper] + ENGINES:
+        engine.MODULE = module
+        engine.importmod()
+
+# Forms of each item from one engine and the seconds it took
+def runengine(engine, items):
+    start = time.perf_counter()
+    forms = [engine.iforms(engine.inflectterm(key, term, pos).chain)
+             for key, term, pos in items]
+    return forms, time.perf_counter() - start
+
+# Compare both engines on a chunk of items
+# Returns (differences, baseline seconds, candidate seconds, forms)
+# where differences are (term, added, removed, reordered)
+def diffchunk(items):
+    base, tbase = runengine(ENGINES[0], items)
+    cand, tcand = runengine(ENGINES[1], items)
+    diffs = []
+    nforms = 0
+    for (_, term, _), b, c in zip(items, base, cand):
+        nforms += len(b)
+        if b == c: continue
+        bs, cs = set(b), set(c)
+        added = [f for f in c if f not in bs]
+        removed = [f for f in b if f not in cs]
+        diffs.append((term, added, removed, not added and not removed))
+    return diffs, tbase, tcand, nforms
+
+# headword -> set of "+form", "-form", "~" and "*" of an --expect file
+def loadexpect(fname):
+    expect = {}
+    with io.open(fname, 'r', encoding='utf-8') as fr:
+        for lineno, line in enumerate(fr, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.startswith("#"): continue
+            try: term, change = line.split("\t")
+            except ValueError:
+                raise ValueError("{}:{}: expected headword<TAB>change".format(fname, lineno))
+            if change not in ("~", "*") and change[:1] not in ("+", "-"):
+                raise ValueError("{}:{}: change must be +form, -form, ~ or *".format(fname, lineno))
+            expect.setdefault(term, set()).add(change)
+    return expect
+
+def writeexpect(fname, diffs):
+    with io.open(fname, 'w', encoding='utf-8') as to:
+        for term, added, removed, reordered in diffs:
+            for change in (["~"] if reordered else []) + \
+                          ["+" + f for f in added] + ["-" + f for f in removed]:
+                to.write("{}\t{}\n".format(term, change))
+
+# The part of a difference the expect file doesn't list, or None
+def unexpected(diff, expect):
+    term, added, removed, reordered = diff
+    listed = expect.get(term, set())
+    if "*" in listed: return None
+    added = [f for f in added if "+" + f not in listed]
+    removed = [f for f in removed if "-" + f not in listed]
+    reordered = reordered and "~" not in listed
+    if not added and not removed and not reordered: return None
+    return term, added, removed, reordered
+
+# Listed changes that didn't happen
+def unmet(diffs, expect):
+    seen = {}
+    for term, added, removed, reordered in diffs:
+        seen.setdefault(term, {"*"}).update(
+            ["+" + f for f in added] + ["-" + f for f in removed] + (["~"] if reordered else []))
+    return [(term, change) for term, changes in sorted(expect.items())
+            for change in sorted(changes) if change not in seen.get(term, ())]
+
+def chunked(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk: return
+        yield chunk
+
+# Peak traced memory in KB of running engine over items
+def peakmemory(engine, items):
+    tracemalloc.start()
+    runengine(engine, items)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak // 1024
+
+def main():
+    args = parseargs()
+    if not args.file and not args.synthetic:
+        print("Nothing to compare: give tab files and/or --synthetic N")
+        sys.exit(2)
+    expect = {}
+    if args.expect:
+        try: expect = loadexpect(args.expect)
+        except ValueError as e:
+            print(e)
+            sys.exit(2)
+
+    initworker(args.baseline, args.candidate, args.module)
+    items = list(sourceitems(args.file)) + list(syntheticitems(args.synthetic, args.seed))
+    print("Comparing {} headwords".format(len(items)))
+
+    diffs = []
+    tbase = tcand = 0.0
+    nforms = 0
+    chunks = chunked(items, 250)
+    if workers(args.jobs) == 1:
+        results = list(map(diffchunk, chunks))
+    else:
+        with Pool(args.jobs, initializer=initworker,
+                  initargs=(args.baseline, args.candidate, args.module)) as pool:
+            results = list(pool.imap(diffchunk, chunks))
+    for d, tb, tc, n in results:
+        diffs.extend(d)
+        tbase += tb
+        tcand += tc
+        nforms += n
+
+    sample = items[:500]
+    mbase = peakmemory(ENGINES[0], sample)
+    mcand = peakmemory(ENGINES[1], sample)
+
+    if args.write_expect: writeexpect(args.write_expect, diffs)
+    surprises = [u for u in (unexpected(d, expect) for d in diffs) if u is not None]
+
+    reordered = [d for d in diffs if d[3]]
+    changed = [d for d in diffs if not d[3]]
+    print("Baseline:  {:.0f} headwords/s, {} KB peak over {} headwords".format(
+        len(items) / (tbase or 1e-9), mbase, len(sample)))
+    print("Candidate: {:.0f} headwords/s, {} KB peak over {} headwords".format(
+        len(items) / (tcand or 1e-9), mcand, len(sample)))
+    print("Speedup:   {:.2f}x".format(tbase / (tcand or 1e-9)))
+    print("{} baseline forms, {} headwords changed, {} only reordered".format(
+        nforms, len(changed), len(reordered)))
+
+    ureordered = [d for d in surprises if not d[1] and not d[2]]
+    uchanged = [d for d in surprises if d[1] or d[2]]
+    if args.expect:
+        print("{} changed and {} reordered headwords not in {}".format(
+            len(uchanged), len(ureordered), args.expect))
+        missing = unmet(diffs, expect)
+        if missing:
+            print("{} expected changes didn't happen, e.g. {}".format(
+                len(missing), " ".join("{} {}".format(*m) for m in missing[:5])))
+
+    for term, added, removed, _ in uchanged[:args.show]:
+        print("{}\n  added:   {}\n  removed: {}".format(
+            term, " ".join(added), " ".join(removed)))
+    if len(uchanged) > args.show:
+        print("... and {} more".format(len(uchanged) - args.show))
+
+    if uchanged or (ureordered and not args.allow_reorder):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
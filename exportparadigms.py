@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Export the forms tab2opfhelper generates for every headword
+# as JSON Lines or CSV instead of kindle markup.
+#
+# Each form carries where it came from: the paradigm (verb,
+# noun or common suffixes), voice, case or tense, the modifier
+# applied to the stem (None, Absorbed, RemoveLast, Switch,
+# RemoveLastVowel) and the capitalized, negative, reflexive,
+# instrumental and which (-х) variant flags.
+#
+# The tab file is streamed a batch of lines at a time, so the export
+# runs in constant memory whatever the size of the source. Lines
+# next to each other with the same key are grouped like the build
+# groups a key, so a headword is one record, inflected with the part
+# of speech tags of all its lines, and its forms are the ones the
+# build generates. Records come out in file order.
+#
+# The build groups a key's lines wherever they are in the file, but
+# here lines of a key that aren't next to each other give separate
+# records, each inflected with only its own lines' tags (63 keys
+# of MoToEng.txt as shipped). Sort the source by lower cased term
+# first for one record per headword.
+#
+# Usage:
+#   python3 exportparadigms.py [-m MODULE] [-f jsonl|csv] [-o OUT] MoToEng.txt
+#
+# JSON Lines: one object per headword
+#   {"headword", "key", "pos": [tags], "definition", "forms": [{...}, ...]}
+#   where definition is the headword's definitions joined with "; "
+# CSV: one row per form, with the headword columns repeated
+
+import io
+import sys
+from itertools import groupby
+import csv
+import json
+import argparse
+
+import tab2opfhelper
+from tab2opfhelper import parsebatches, termgroups, termpos, inflectterm, \
+    INFLECTIONFLAGS
+
+FORMFIELDS = ["form", "stem", "suffix", "modifier", "paradigm", "voice",
+              "case", "tense"] + list(INFLECTIONFLAGS)
+
+def parseargs():
+    parser = argparse.ArgumentParser("exportparadigms")
+    parser.add_argument("-v", "--verbose", help="make verbose",
+                        action="store_true")
+    parser.add_argument("-m", "--module",
+                        help="Import module for mapping, getkey, getdef")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv"],
+                        default="jsonl", help="Output format")
+    parser.add_argument("-o", "--output", help="Output file (stdout by default)")
+    parser.add_argument("file", help="tab file to export")
+    return parser.parse_args()
+
+# One record per headword of fname, generated lazily
+# Each run of lines with the same key is grouped like
+# writekey groups a key
+def paradigms(fname):
+    with io.open(fname, 'r', encoding='utf-8') as fr:
+        for key, run in groupby(parsebatches(fr), key=lambda kd: kd[0]):
+            yield from keyrecords(key, [ndef for _, ndef in run])
+
+# The records of the headwords of one key
+#  defn: [[term, defn, key==term, pos]...]
+def keyrecords(key, defn):
+    for term, g in termgroups(defn):
+        pos = termpos(g)
+        mg = inflectterm(key, term, pos, record=True)
+        yield {"headword": term, "key": key, "pos": list(pos),
+               "definition": '; '.join(ndefn for _, ndefn, _, _ in g),
+               "forms": mg.forms}
+
+def writejsonl(records, to):
+    for record in records:
+        to.write(json.dumps(record, ensure_ascii=False))
+        to.write("\n")
+
+def writecsv(records, to):
+    writer = csv.writer(to)
+    writer.writerow(["headword", "key", "pos"] + FORMFIELDS)
+    for record in records:
+        head = [record["headword"], record["key"], ",".join(record["pos"])]
+        for form in record["forms"]:
+            writer.writerow(head + [form[f] for f in FORMFIELDS])
+
+def main():
+    args = parseargs()
+    tab2opfhelper.VERBOSE = args.verbose
+    tab2opfhelper.MODULE = args.module
+    tab2opfhelper.importmod()
+
+    write = writejsonl if args.format == "jsonl" else writecsv
+    if args.output:
+        with io.open(args.output, 'w', encoding='utf-8', newline='') as to:
+            write(paradigms(args.file), to)
+    else:
+        write(paradigms(args.file), sys.stdout)
+
+if __name__ == "__main__":
+    main()
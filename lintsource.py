@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Check a tab source for every problem in one pass, instead of
+# fixing the build one "Bad line" at a time.
+#
+# Each line is checked for:
+#   bom               a stray byte order mark (U+FEFF)
+#   no-tab            no tab between term and definition
+#   empty-key         nothing left of the term once keyed
+#   empty-definition  nothing after the tab
+#   latin-letters     Latin letters mixed into a Cyrillic term, or
+#                     a term typed only in Latin look-alikes
+#   missing-pos       no part of speech tag before the definition
+#   unknown-pos       a tag that has no entry in PARADIGMS
+#   duplicate-key     the term keys the same as an earlier line
+#
+# Terms are keyed with normalizeUnicode and the plugin's getkeys
+# like the build does. Nothing is written but the report.
+#
+# Usage:
+#   python3 lintsource.py [-m MODULE] [-f text|json] MoToEng.txt
+#
+# Exits with 1 if any problems were found.
+
+import io
+import re
+import sys
+import json
+import argparse
+
+import tab2opfhelper
+from tab2opfhelper import inclline, normalizeUnicode, escapekey, parsepos, \
+    checkbatch, PARADIGMS, BATCHSIZE
+
+LATIN = re.compile(r"[A-Za-z]")
+# Latin letters that pass for Cyrillic ones
+LOOKALIKES = set("aceopxykmhtbACEHKMOPTXYB")
+CYRILLIC = re.compile("[\u0400-\u04ff]")
+
+def parseargs():
+    parser = argparse.ArgumentParser("lintsource")
+    parser.add_argument("-m", "--module",
+                        help="Import module for mapping, getkey, getdef")
+    parser.add_argument("-f", "--format", choices=["text", "json"],
+                        default="text", help="Report format")
+    parser.add_argument("file", help="tab file to check")
+    return parser.parse_args()
+
+# Problems of lines that split into term and definition,
+# checked a batch at a time so the plugin sees whole lists
+#  batch: [(lineno, term, defn)...]
+#  seen: key -> line it was first seen on
+def lintbatch(batch, seen):
+    defns = checkbatch("getdefs", tab2opfhelper.getdefs([defn for _, _, defn in batch]), batch)
+    keys = checkbatch("getkeys", tab2opfhelper.getkeys(
+        [normalizeUnicode(term.strip()) for _, term, _ in batch]), batch)
+    for (lineno, term, _), defn, key in zip(batch, defns, keys):
+        term = term.strip()
+        key = escapekey(key)
+        if key == '':
+            yield lineno, "empty-key", "term '{}' has no key".format(term)
+        if defn.strip() == '':
+            yield lineno, "empty-definition", "'{}' has no definition".format(term)
+        else:
+            pos = parsepos(defn)
+            if pos is None:
+                yield lineno, "missing-pos", "'{}' has no part of speech tag".format(term)
+            elif pos not in PARADIGMS:
+                yield lineno, "unknown-pos", "'{}' has unknown tag '{}'".format(term, pos)
+        latin = set(LATIN.findall(term))
+        if latin and (CYRILLIC.search(term) or latin <= LOOKALIKES):
+            yield lineno, "latin-letters", "'{}' has Latin {}".format(
+                term, ''.join(sorted(latin)))
+        if key != '':
+            if key in seen:
+                yield lineno, "duplicate-key", "'{}' keys as '{}' like line {}".format(
+                    term, key, seen[key])
+            else: seen[key] = lineno
+
+# Every problem of the lines of fr as (line number, code, message)
+def lint(fr):
+    seen = {}
+    batch = []
+    for lineno, r in enumerate(fr, 1):
+        if '\ufeff' in r:
+            yield lineno, "bom", "byte order mark in line"
+            r = r.replace('\ufeff', '')
+        if not inclline(r): continue
+        try: term, defn = r.split('\t', 1)
+        except ValueError:
+            yield lineno, "no-tab", "no tab in '{}'".format(r.strip())
+            continue
+        batch.append((lineno, term, defn))
+        if len(batch) >= BATCHSIZE:
+            yield from lintbatch(batch, seen)
+            batch = []
+    yield from lintbatch(batch, seen)
+
+def main():
+    args = parseargs()
+    tab2opfhelper.MODULE = args.module
+    tab2opfhelper.importmod()
+
+    nproblems = 0
+    with io.open(args.file, 'r', encoding='utf-8') as fr:
+        if args.format == "json":
+            problems = [{"file": args.file, "line": lineno, "code": code, "message": msg}
+                        for lineno, code, msg in lint(fr)]
+            json.dump(problems, sys.stdout, ensure_ascii=False, indent=1)
+            print()
+            nproblems = len(problems)
+        else:
+            for lineno, code, msg in lint(fr):
+                print("{}:{}: {}: {}".format(args.file, lineno, code, msg))
+                nproblems += 1
+            print("{} problems".format(nproblems), file=sys.stderr)
+    sys.exit(1 if nproblems else 0)
+
+if __name__ == "__main__":
+    main()
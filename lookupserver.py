@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Local lookup server for a tab dictionary built by tab2opfhelper.
+#
+# Loads the tab file the same way the build does, generates the
+# inflections for every headword and answers lookups over HTTP
+# with JSON, so the dictionary can be tested without sideloading
+# a .mobi onto a device.
+#
+# Usage:
+#   python3 lookupserver.py [-m MODULE] [-p 8080] MoToEng.txt
+#
+#   GET /lookup?q=<word>   headword entries the word resolves to
+#   GET /stats             request, latency and cache counters
+#
+# Only the standard library is used.
+
+import json
+import time
+import asyncio
+import argparse
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+import tab2opfhelper
+from tab2opfhelper import readkeys, termgroups, termpos, inflectterm, iforms, \
+    lookupkey, lookupkeys
+
+def parseargs():
+    parser = argparse.ArgumentParser("lookupserver")
+    parser.add_argument("-v", "--verbose", help="make verbose",
+                        action="store_true")
+    parser.add_argument("-m", "--module",
+                        help="Import module for mapping, getkey, getdef")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("-p", "--port", type=int, default=8080,
+                        help="Port to listen on")
+    parser.add_argument("-c", "--cache-size", type=int, default=4096,
+                        help="Number of lookups kept in the LRU cache")
+    parser.add_argument("file", help="tab file to serve")
+    return parser.parse_args()
+
+# Least recently used cache of lookup responses,
+# counting hits and misses
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try: value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.size <= 0: return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+# Headwords and their inflections, keyed like the build keys them
+#  defns: key -> [[term, defn, key==term, pos]...] from readkeys
+#  forms: key of an inflected form -> [key...] of headwords generating it
+class LookupIndex:
+    def __init__(self, defns):
+        self.defns = defns
+        self.forms = {}
+        for key, defn in defns.items():
+            for term, g in termgroups(defn):
+                forms = iforms(inflectterm(key, term, termpos(g)).chain)
+                for fkey in lookupkeys(forms):
+                    keys = self.forms.setdefault(fkey, [])
+                    if key not in keys: keys.append(key)
+
+    def entry(self, key, match):
+        terms = [{"term": term, "pos": list(termpos(g)),
+                  "definition": '; '.join(d for _, d, _, _ in g)}
+                 for term, g in termgroups(self.defns[key])]
+        return {"headword": key, "match": match, "terms": terms}
+
+    # Headword match first, then every headword that
+    # generates the word as an inflected form
+    # key is the lookupkey of the word
+    def lookup(self, key):
+        entries = []
+        if key in self.defns:
+            entries.append(self.entry(key, "headword"))
+        for fkey in self.forms.get(key, []):
+            if fkey != key:
+                entries.append(self.entry(fkey, "inflection"))
+        return {"key": key, "entries": entries}
+
+# Request counts and lookup latency in seconds
+class Stats:
+    def __init__(self):
+        self.requests = 0
+        self.lookups = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, elapsed):
+        self.lookups += 1
+        self.latency_total += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+
+    def asdict(self, cache):
+        lookups = self.lookups
+        return {"requests": self.requests,
+                "lookups": lookups,
+                "errors": self.errors,
+                "latency_avg_ms": 1000 * self.latency_total / lookups if lookups else 0.0,
+                "latency_max_ms": 1000 * self.latency_max,
+                "cache_size": len(cache.entries),
+                "cache_hits": cache.hits,
+                "cache_misses": cache.misses}
+
+class LookupServer:
+    def __init__(self, index, cachesize):
+        self.index = index
+        self.cache = LRUCache(cachesize)
+        self.stats = Stats()
+
+    # Responses are cached by key, so words that only differ
+    # in case or spacing share an entry; the query is put in
+    # front of the cached {"key", "entries"} body
+    def lookup(self, word):
+        start = time.perf_counter()
+        key = lookupkey(word)
+        result = self.cache.get(key)
+        if result is None:
+            result = json.dumps(self.index.lookup(key), ensure_ascii=False)
+            self.cache.put(key, result)
+        self.stats.record(time.perf_counter() - start)
+        return '{{"query": {}, {}'.format(json.dumps(word, ensure_ascii=False), result[1:])
+
+    # Map a request path to (status, json body)
+    def route(self, target):
+        url = urlsplit(target)
+        if url.path == "/lookup":
+            query = parse_qs(url.query)
+            words = query.get("q") or query.get("word")
+            if not words or not words[0].strip():
+                return 400, json.dumps({"error": "missing q parameter"})
+            return 200, self.lookup(words[0])
+        if url.path == "/stats":
+            return 200, json.dumps(self.stats.asdict(self.cache))
+        return 404, json.dumps({"error": "not found"})
+
+    # The request line and headers of the next request
+    # Returns None at the end of the connection; raises
+    # ValueError for a bad request line or a line longer
+    # than the stream limit
+    async def readrequest(self, reader):
+        line = await reader.readline()
+        if not line: return None
+        method, target, version = line.decode("latin-1").split()
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""): break
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+        return method, target, version, headers
+
+    # HTTP/1.1 with keep-alive, GET only
+    # Request bodies aren't read, so the connection is closed
+    # after a request that has one or isn't a GET
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try: request = await self.readrequest(reader)
+                except (ValueError, asyncio.LimitOverrunError):
+                    self.stats.requests += 1
+                    self.stats.errors += 1
+                    await self.respond(writer, 400, json.dumps({"error": "bad request"}), False)
+                    break
+                if request is None: break
+                method, target, version, headers = request
+
+                keepalive = version == "HTTP/1.1" and headers.get("connection") != "close" \
+                    or headers.get("connection") == "keep-alive"
+                if headers.get("content-length", "0") != "0" or "transfer-encoding" in headers:
+                    keepalive = False
+
+                self.stats.requests += 1
+                if method != "GET":
+                    status, body = 405, json.dumps({"error": "method not allowed"})
+                    keepalive = False
+                else:
+                    try: status, body = self.route(target)
+                    except Exception as e:
+                        status, body = 500, json.dumps({"error": str(e)})
+                if status >= 400: self.stats.errors += 1
+
+                await self.respond(writer, status, body, keepalive)
+                if not keepalive: break
+        except ConnectionError: pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, body, keepalive):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                   405: "Method Not Allowed", 500: "Internal Server Error"}
+        data = body.encode("utf-8")
+        writer.write("HTTP/1.1 {} {}\r\n"
+                     "Content-Type: application/json; charset=utf-8\r\n"
+                     "Content-Length: {}\r\n"
+                     "Connection: {}\r\n\r\n".format(
+                         status, reasons[status], len(data),
+                         "keep-alive" if keepalive else "close").encode("latin-1"))
+        writer.write(data)
+        await writer.drain()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print("Serving on http://{}:{}/".format(host, port))
+        async with server:
+            await server.serve_forever()
+
+def main():
+    args = parseargs()
+    tab2opfhelper.VERBOSE = args.verbose
+    tab2opfhelper.MODULE = args.module
+    tab2opfhelper.importmod()
+
+    print("Reading keys")
+    defns = readkeys(args.file)
+    print("Indexing inflections")
+    index = LookupIndex(defns)
+    print("{} headwords, {} forms".format(len(index.defns), len(index.forms)))
+
+    server = LookupServer(index, args.cache_size)
+    try: asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    main()
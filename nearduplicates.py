@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Find headwords that are probably the same word typed differently:
+# о/ө and у/ү swapped, Latin look-alikes typed for Cyrillic letters,
+# stray punctuation, or (with -d) a letter or two off.
+#
+# Keys are made the way the build makes them (normalizeUnicode and
+# the plugin's getkeys), then folded: look-alikes to Cyrillic, ө to о,
+# ү to у, ё to е and everything but letters dropped. Keys are blocked
+# by the consonant skeleton of the folded key and, with -d, also by
+# the skeleton less each one of its consonants. The edit distance is
+# only computed between keys of the same block whose lengths are
+# close enough, so the work grows with the size of the blocks rather
+# than with every pair of headwords. Because of the blocks, keys
+# whose consonants differ by more than one edit are never compared,
+# whatever -d is.
+#
+# Usage:
+#   python3 nearduplicates.py [-m MODULE] [-d 0] [-f text|json] MoToEng.txt
+
+import sys
+import json
+import argparse
+
+import tab2opfhelper
+from tab2opfhelper import readkeys, termgroups
+
+# Latin letters typed for the Cyrillic ones they look like
+LOOKALIKES = str.maketrans("aceopxykmhtbACEHKMOPTXYB",
+                           "асеорхукмнтвасенкмортхув")
+# Letters that are easy to mix up, folded together
+FOLD = str.maketrans("өүё", "оуе")
+VOWELS = set("аеёийоөуүыэюяьъ")
+
+def parseargs():
+    parser = argparse.ArgumentParser("nearduplicates")
+    parser.add_argument("-m", "--module",
+                        help="Import module for mapping, getkey, getdef")
+    parser.add_argument("-d", "--distance", type=int, default=0,
+                        help="Largest edit distance between folded keys")
+    parser.add_argument("-f", "--format", choices=["text", "json"],
+                        default="text", help="Report format")
+    parser.add_argument("file", help="tab file to check")
+    return parser.parse_args()
+
+# key with look-alikes, easily confused letters and
+# everything but letters folded away
+def foldkey(key):
+    key = key.lower().translate(LOOKALIKES).translate(FOLD)
+    return ''.join(c for c in key if c.isalpha())
+
+# The block a folded key is compared within: its consonants
+def skeleton(folded):
+    return ''.join(c for c in folded if c not in VOWELS)
+
+# Levenshtein distance of a and b, or limit+1 once it's
+# certain to be more than limit
+def editdistance(a, b, limit):
+    if abs(len(a) - len(b)) > limit: return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j-1] + 1, prev[j-1] + (ca != cb)))
+        if min(cur) > limit: return limit + 1
+        prev = cur
+    return prev[-1]
+
+# The blocks a folded key goes in: its skeleton and, for
+# distance > 0, its skeleton less any one consonant, so keys
+# one consonant apart share a block
+def blocksof(folded, distance=0):
+    skel = skeleton(folded)
+    blocks = {skel}
+    if distance > 0:
+        blocks.update(skel[:i] + skel[i+1:] for i in range(len(skel)))
+    return blocks
+
+# For editors: one entry per folded key that has another key
+# folding the same or other folded keys within distance, as
+# (keys, neighbours) where keys fold the same and neighbours
+# are [(distance, [keys...])...] of the folded keys nearby,
+# closest first. Entries with exact duplicates come first,
+# then the ones whose closest neighbour is nearest and, among
+# those, the ones with the fewest neighbours, which are the
+# likeliest typos rather than short words a letter apart.
+def neardupes(keys, distance=0):
+    folds = {}
+    for key in keys:
+        folds.setdefault(foldkey(key), []).append(key)
+
+    near = {}
+    if distance > 0:
+        blocks = {}
+        for folded in folds:
+            for block in blocksof(folded, distance):
+                blocks.setdefault(block, []).append((len(folded), folded))
+        for block in blocks.values():
+            block.sort()
+            for i, (la, fa) in enumerate(block):
+                for lb, fb in block[i+1:]:
+                    if lb - la > distance: break
+                    if fb in near.get(fa, {}): continue
+                    d = editdistance(fa, fb, distance)
+                    if d <= distance:
+                        near.setdefault(fa, {})[fb] = d
+                        near.setdefault(fb, {})[fa] = d
+
+    entries = []
+    for folded, group in folds.items():
+        neighbours = sorted((d, sorted(folds[f])) for f, d in near.get(folded, {}).items())
+        if len(group) > 1 or neighbours:
+            entries.append((sorted(group), neighbours))
+    return sorted(entries, key=lambda e: (
+        0 if len(e[0]) > 1 else e[1][0][0], len(e[1]), -len(e[0]), e[0]))
+
+def main():
+    args = parseargs()
+    tab2opfhelper.MODULE = args.module
+    tab2opfhelper.importmod()
+
+    defns = readkeys(args.file)
+    entries = neardupes(list(defns), args.distance)
+
+    def terms(key):
+        return [term for term, _ in termgroups(defns[key])]
+    def definitions(key):
+        return "; ".join(d for _, g in termgroups(defns[key]) for _, d, _, _ in g)
+
+    if args.format == "json":
+        json.dump([{"keys": [{"key": key, "terms": terms(key)} for key in group],
+                    "neighbours": [{"distance": d, "keys": [{"key": key, "terms": terms(key)}
+                                                            for key in near]}
+                                   for d, near in neighbours]}
+                   for group, neighbours in entries],
+                  sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    else:
+        for group, neighbours in entries:
+            for key in group:
+                print("{}\t{}".format(key, definitions(key)))
+            for d, near in neighbours:
+                for key in near:
+                    print("  ~{} {}\t{}".format(d, key, definitions(key)))
+            print()
+        print("{} entries".format(len(entries)), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
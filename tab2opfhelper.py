@@ -48,26 +48,47 @@ from itertools import islice, count, groupby
 from contextlib import contextmanager
 import importlib
 import io
+import re
+import mmap
+import heapq
+import random
+from multiprocessing import Pool
 
 # Stop with the encoding -- it's broken anyhow
 # in the kindles and undefined.
-def normalizeLetter(ch):
-    try: ch = mapping[ch]
-    except KeyError: pass
-    return ch
-
 def normalizeUnicode(text):
     """
     Reduce some characters to something else
     """
-    return ''.join(normalizeLetter(c) for c in text)
+    return text.translate(TRANSLATION)
+
+# str.translate table of mapping, rebuilt by importmod
+TRANSLATION = {}
+def maketranslation(mapping):
+    return str.maketrans({c: n for c, n in mapping.items() if len(c) == 1})
 
 # Args:
 #  --verbose
 #  --module: module to load and attempt to extract getdef, getkey & mapping
+#            and the batch versions getdefs(list), getkeys(list) that
+#            map a whole list at once, plus setup() which is called
+#            once after loading for any precomputation
 #  --source: source language code (en by default)
 #  --target: target language code (en by default)
-#  file: the tab delimited file to read
+#  --corpus: text corpus, drop inflections that aren't in it
+#  --min-freq: corpus count a form needs to be kept (1 by default)
+#  --form-budget: max forms kept per headword (no limit by default)
+#  --jobs: processes used for reading and counting the corpus (all cores by default)
+#  --priority: priority of each file (earlier files first by default)
+#  --conflict: keys defined in several files keep all their
+#              definitions, only the first file's, or are concatenated
+#              without repeating identical definitions
+#  --letters, --match, --words, --words-file, --sample:
+#              preview, only build the keys in a letter range, matching
+#              a regex, in a list of headwords or a random sample of them.
+#              The output is named {name}_preview
+#  file: the tab delimited files to read, the output is named
+#        after the first one
 
 def parseargs():
     if len(sys.argv) < 1:
@@ -88,8 +109,73 @@ def parseargs():
                         help="Import module for mapping, getkey, getdef")
     parser.add_argument("-s", "--source", default="en", help="Source language")
     parser.add_argument("-t", "--target", default="en", help="Target language")
-    parser.add_argument("file", help="tab file to input")    
-    return parser.parse_args()
+    parser.add_argument("-c", "--corpus",
+                        help="Text corpus to keep only the inflections found in")
+    parser.add_argument("--min-freq", type=positive, default=1,
+                        help="Times a form must occur in the corpus to be kept")
+    parser.add_argument("--form-budget", type=nonnegative, default=0,
+                        help="Keep at most this many forms per headword, most frequent first (0 for no limit)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of processes for reading the source and counting the corpus (all cores by default)")
+    parser.add_argument("-p", "--priority", type=priorities,
+                        help="Comma separated priority of each file, highest wins (the order given by default)")
+    parser.add_argument("--conflict", choices=CONFLICTS, default="all",
+                        help="What to do with a key defined in several files")
+    parser.add_argument("--letters", type=letterrange,
+                        help="Preview: only keys starting with a letter in a range like а-в")
+    parser.add_argument("--match", type=regex,
+                        help="Preview: only keys matching this regular expression")
+    parser.add_argument("--words",
+                        help="Preview: only these comma separated headwords")
+    parser.add_argument("--words-file",
+                        help="Preview: only the headwords listed one per line in this file")
+    parser.add_argument("--sample", type=positive,
+                        help="Preview: only a random sample of this many keys")
+    parser.add_argument("--seed", type=int, help="Random seed for --sample")
+    parser.add_argument("file", nargs="+", help="tab files to input")    
+    args = parser.parse_args()
+    if args.priority is not None and len(args.priority) != len(args.file):
+        parser.error("--priority needs one number per file")
+    return args
+
+def priorities(p):
+    try: return [int(n) for n in p.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected numbers like 2,1,1: '{}'".format(p))
+
+def positive(p):
+    try: n = int(p)
+    except ValueError: n = 0
+    if n <= 0:
+        raise argparse.ArgumentTypeError("expected a number above 0: '{}'".format(p))
+    return n
+
+def nonnegative(p):
+    try: n = int(p)
+    except ValueError: n = -1
+    if n < 0:
+        raise argparse.ArgumentTypeError("expected a number 0 or above: '{}'".format(p))
+    return n
+
+def regex(r):
+    try: return re.compile(r)
+    except re.error as e:
+        raise argparse.ArgumentTypeError("bad regular expression '{}': {}".format(r, e))
+
+# Mongolian alphabet order, as in MoAlphaBetOrder.txt
+MNALPHABET = "абвгдеёжзийклмноөпрстуүфхцчшщъыьэюя"
+
+# "а-в" or "а" as the letters of MNALPHABET in that range
+def letterrange(r):
+    first, _, last = r.lower().partition("-")
+    last = last or first
+    if len(first) != 1 or len(last) != 1 or \
+       first not in MNALPHABET or last not in MNALPHABET:
+        raise argparse.ArgumentTypeError("expected a letter range like а-в: '{}'".format(r))
+    if MNALPHABET.index(first) > MNALPHABET.index(last):
+        raise argparse.ArgumentTypeError("{} comes after {} in the alphabet: '{}'".format(
+            first, last, r))
+    return MNALPHABET[MNALPHABET.index(first):MNALPHABET.index(last)+1]
 
 def loadmember(mod, attr, dfault):
     if hasattr(mod, attr):
@@ -106,46 +192,93 @@ def importmod():
 
     loadmember(mod, 'getkey', lambda key: key)
     loadmember(mod, 'getdef', lambda dfn: dfn)
+    loadmember(mod, 'getkeys', lambda keys: [getkey(k) for k in keys])
+    loadmember(mod, 'getdefs', lambda dfns: [getdef(d) for d in dfns])
     loadmember(mod, 'mapping', {})
-
-args = parseargs()
-VERBOSE  = args.verbose
-FILENAME = args.file
-MODULE   = args.module
-INLANG   = args.source
-OUTLANG  = args.target
+    loadmember(mod, 'setup', lambda: None)
+
+    global TRANSLATION
+    setup()
+    TRANSLATION = maketranslation(mapping)
+
+# Defaults so the functions below can be used by other
+# scripts that import this module; main() overrides them
+# from the command line.
+VERBOSE  = False
+FILENAME = None
+MODULE   = None
+INLANG   = "en"
+OUTLANG  = "en"
+JOBS     = None
+CORPUS   = None  # word -> count, None to keep every form
+MINFREQ  = 1
+FORMBUDGET = 0
 importmod()
 
-# add a single [term, definition]
-# to defs[key]
-# r is a tab split line
-def readkey(r, defs):
-    try: term, defn =  r.split('\t',1)
-    except ValueError:
-        print("Bad line: '{}'".format(r))
-        raise
+# Escape a key for use in an attribute and
+# fold it to lower case
+def escapekey(key):
+    return key.\
+        replace('"', "'").\
+        replace('<', '\\<').\
+        replace('>', '\\>').\
+        lower().strip()
+
+# The key a looked up word is filed under,
+# the same way readkey keys a term
+def lookupkey(word):
+    return lookupkeys([word])[0]
 
-    term = term.strip()
-    defn = getdef(defn)
+def lookupkeys(words):
+    keys = getkeys([normalizeUnicode(word.strip()) for word in words])
+    return [escapekey(key) for key in checkbatch("getkeys", keys, words)]
+
+# Split tab lines into terms and definitions
+def splitlines(rs):
+    terms, defns = [], []
+    for r in rs:
+        try: term, defn =  r.split('\t',1)
+        except ValueError:
+            print("Bad line: '{}'".format(r))
+            raise
+        terms.append(term.strip())
+        defns.append(defn)
+    return terms, defns
+
+# Parse a list of tab split lines rs, passing them through
+# the plugin's getdefs and getkeys a list at a time
+# Returns [key, [term, definition, key==term, part of speech]]
+# for each line
+def parselines(rs):
+    terms, defns = splitlines(rs)
+    defns = checkbatch("getdefs", getdefs(defns), terms)
+    nkeys = [normalizeUnicode(term) for term in terms]
+    keys = checkbatch("getkeys", getkeys(nkeys), terms)
+    return [parsedline(term, defn, nkey, key)
+            for term, defn, nkey, key in zip(terms, defns, nkeys, keys)]
+
+# A plugin's getkeys and getdefs must return one item per
+# item they are given, or lines would go missing silently
+def checkbatch(name, got, given):
+    if len(got) != len(given):
+        raise Exception("{} of {} returned {} results for {} lines".format(
+            name, MODULE, len(got), len(given)))
+    return got
+
+# Parse a single tab split line r into
+# key, [term, definition, key==term, part of speech]
+def parseline(r):
+    return parselines([r])[0]
+
+def parsedline(term, defn, nkey, key):
     defn = defn.replace("\\\\","\\").\
         replace(">", "\\>").\
         replace("<", "\\<").\
         replace("\\n","<br/>\n").\
         strip()
 
-    nkey = normalizeUnicode(term)
-    key = getkey(nkey)
-    key = key.\
-        replace('"', "'").\
-        replace('<', '\\<').\
-        replace('>', '\\>').\
-        lower().strip()
-
-    nkey = nkey.\
-        replace('"', "'").\
-        replace('<', '\\<').\
-        replace('>', '\\>').\
-        lower().strip()
+    key = escapekey(key)
+    nkey = escapekey(nkey)
 
     if key == '':
         raise Exception("Missing key {}".format(term))
@@ -154,7 +287,15 @@ def readkey(r, defs):
 
     if VERBOSE: print(key, ":", term)
 
-    ndef = [term, defn, key == nkey]
+    return key, [term, defn, key == nkey, parsepos(defn)]
+
+# add a single [term, definition, key==term, part of speech]
+# to defs[key]
+# r is a tab split line
+def readkey(r, defs):
+    addkey(defs, *parseline(r))
+
+def addkey(defs, key, ndef):
     if key in defs: defs[key].append(ndef)
     else:           defs[key] = [ndef]
 
@@ -163,19 +304,177 @@ def inclline(s):
     s = s.lstrip()
     return len(s) != 0 and s[0] != '#'
 
-# Iterate over FILENAME, reading lines of
+# Iterate over filename (FILENAME by default), reading lines of
 # term {tab} definition
 # skips empty lines and commented out lines
+# Lines are parsed BATCHSIZE at a time so plugins
+# get whole lists in getkeys and getdefs
+#
+# Sources bigger than READCHUNK are split into chunks
+# of about that size and parsed by jobs processes
+# (JOBS by default), see readchunks. With only one
+# process to use the file is read here instead.
 #
-def readkeys():
-    if VERBOSE: print("Reading {}".format(FILENAME))
+BATCHSIZE = 10000
+READCHUNK = 16 * 1024 * 1024
+def readkeys(filename=None, jobs=None):
+    if filename is None: filename = FILENAME
+    if jobs is None: jobs = JOBS
+    if VERBOSE: print("Reading {}".format(filename))
+    if workers(jobs) > 1 and os.path.getsize(filename) > READCHUNK:
+        return readchunks(filename, jobs)
+
     #with open(FILENAME,'r', encoding='utf-8') as fr:
-    with io.open(FILENAME,'r', encoding='utf-8') as fr:
+    with io.open(filename,'r', encoding='utf-8') as fr:
         defns = {}
-        for r in filter(inclline, fr):
-            readkey(r, defns)
+        for key, ndef in parsebatches(fr):
+            addkey(defns, key, ndef)
         return defns
 
+# The number of processes jobs stands for: all cores for None
+def workers(jobs):
+    return jobs or os.cpu_count() or 1
+
+# Parse the lines of fr, BATCHSIZE at a time
+# Yields key, [term, defn, key==term, pos]
+def parsebatches(fr):
+    lines = filter(inclline, fr)
+    while True:
+        rs = list(islice(lines, BATCHSIZE))
+        if len(rs) == 0: break
+        yield from parselines(rs)
+
+# Byte ranges (start, end) of filename of about chunksize
+# bytes, each ending just after a newline
+def sourcechunks(filename, chunksize=READCHUNK):
+    size = os.path.getsize(filename)
+    if size == 0: return []
+    ranges = []
+    with open(filename, 'rb') as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = mm.find(b'\n', min(start + chunksize, size) - 1)
+            end = size if end < 0 else end + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+# Parse the lines of one byte range of filename
+# Returns [(key, [term, defn, key==term, pos])...] in file
+# order, a flat list being cheaper to send back than a dict
+def readchunk(chunk):
+    filename, start, end = chunk
+    with open(filename, 'rb') as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+    # newline=None splits lines like reading the file in text mode
+    return list(parsebatches(io.StringIO(text, newline=None)))
+
+# Load the plugin in a worker process if it hasn't inherited it
+def initreader(module, verbose):
+    global MODULE, VERBOSE
+    VERBOSE = verbose
+    if MODULE != module:
+        MODULE = module
+        importmod()
+
+# readkeys for big sources: the memory mapped file is split
+# into newline aligned chunks that are parsed by a pool of
+# jobs processes (all cores for None). The chunks are merged
+# back in file order so defns comes out the same as reading
+# the file line by line.
+def readchunks(filename, jobs=None, chunksize=READCHUNK):
+    chunks = [(filename, start, end) for start, end in sourcechunks(filename, chunksize)]
+    defns = {}
+    with Pool(jobs, initializer=initreader, initargs=(MODULE, VERBOSE)) as pool:
+        for parsed in pool.imap(readchunk, chunks):
+            for key, ndef in parsed:
+                addkey(defns, key, ndef)
+    return defns
+
+# Read each of filenames on its own and k-way merge them by key.
+# With more files than jobs processes the files are read in
+# parallel, one per process; otherwise one after another, so each
+# can be split between the processes by readkeys.
+# priorities orders the files, highest first; by default
+# the order they are given in. conflict says what to keep
+# for a key defined in more than one file, see mergekey.
+def readsources(filenames, priorities=None, conflict="all", jobs=None):
+    if jobs is None: jobs = JOBS
+    filenames = rankfiles(filenames, priorities)
+
+    nworkers = workers(jobs)
+    if nworkers == 1 or len(filenames) <= nworkers:
+        sources = [readsorted(f, jobs) for f in filenames]
+    else:
+        with Pool(nworkers, initializer=initreader, initargs=(MODULE, VERBOSE)) as pool:
+            sources = pool.map(readsorted, filenames)
+    return mergesources(sources, conflict)
+
+# filenames highest priority first
+def rankfiles(filenames, priorities=None):
+    if priorities is None: priorities = [-i for i in range(len(filenames))]
+    ranked = sorted(zip(filenames, priorities), key=lambda fp: -fp[1])
+    return [f for f, _ in ranked]
+
+# Merge sources by key, where sources are the readsorted
+# keys of each file, highest priority first
+def mergesources(sources, conflict="all"):
+    # (key, rank, entries) of every file in key then rank order
+    streams = [rankedkeys(source, rank) for rank, source in enumerate(sources)]
+    defns = {}
+    for key, g in groupby(heapq.merge(*streams), key=lambda s: s[0]):
+        defns[key] = mergekey([ndefs for _, _, ndefs in g], conflict)
+    return defns
+
+def rankedkeys(source, rank):
+    for key, ndefs in source:
+        yield key, rank, ndefs
+
+# The keys of filename in sorted order, read by jobs processes
+# Returns [(key, [[term, defn, key==term, pos]...])...]
+def readsorted(filename, jobs=1):
+    return sorted(readkeys(filename, jobs).items())
+
+# Merge the entries a key has in several files, in priority order
+#  all: keep every definition
+#  first: keep only the highest priority file's definitions
+#  concat: keep every definition, but only once per term
+CONFLICTS = ["all", "first", "concat"]
+def mergekey(sources, conflict="all"):
+    if conflict == "first": return sources[0]
+    merged = [ndef for ndefs in sources for ndef in ndefs]
+    if conflict == "concat":
+        seen = set()
+        unique = []
+        for ndef in merged:
+            d = (ndef[0], ndef[1].lower())
+            if d in seen: continue
+            seen.add(d)
+            unique.append(ndef)
+        merged = unique
+    return merged
+
+# The part of defns a preview build writes
+#  letters: keys starting with one of these letters
+#  match: keys matching this regex (a string or compiled)
+#  words: keys of these headwords
+#  sample: this many of the keys left, picked at random with seed
+def selectkeys(defns, letters=None, match=None, words=None, sample=None, seed=None):
+    keys = list(defns)
+    if letters is not None:
+        keys = [k for k in keys if k[:1] in letters]
+    if match is not None:
+        rx = re.compile(match)
+        keys = [k for k in keys if rx.search(k)]
+    if words is not None:
+        wanted = set(lookupkey(w) for w in words)
+        keys = [k for k in keys if k in wanted]
+    if sample is not None and sample < len(keys):
+        keys = random.Random(seed).sample(sorted(keys), sample)
+    return {k: defns[k] for k in keys}
+
 # Write to key file {name}{n}.html
 # put the body inside the context manager
 # The onclick here gives a kindlegen warning
@@ -263,6 +562,41 @@ def capitalize(word):
     
     return word
 
+# The forms makeinflection writes for word, in order, as
+# [form, flags] where flags names the variants applied:
+# capitalized, negative, reflexive, instrumental, which
+# Only used to record where forms come from, see MongolianWord
+def inflectionforms(word,capitalizeYN=True, negativeYN=False,reflexiveYN=False,instrumentalYN=False,whichIsMarkerYN=False):
+    vowelharmony=getvowelharmonyletter(word)[0]
+    forms=[[word,()]]
+    if(capitalizeYN):
+        forms.append([capitalize(word),("capitalized",)])
+    if(negativeYN):
+        forms.append([word+"гүй",("negative",)])
+        if(capitalizeYN):
+            forms.append([capitalize(word)+"гүй",("capitalized","negative")])
+    if(reflexiveYN):
+        forms.append([word+vowelharmony+vowelharmony,("reflexive",)])
+        if(capitalizeYN):
+            forms.append([capitalize(word)+vowelharmony+vowelharmony,("capitalized","reflexive")])
+    if(instrumentalYN):
+        forms.append([word+vowelharmony+vowelharmony+"р",("instrumental",)])
+        if(capitalizeYN):
+            forms.append([capitalize(word)+vowelharmony+vowelharmony+"р",("capitalized","instrumental")])
+        if(reflexiveYN):
+            forms.append([word+vowelharmony+vowelharmony+"р"+vowelharmony+vowelharmony,("instrumental","reflexive")])
+            if(capitalizeYN):
+                forms.append([capitalize(word)+vowelharmony+vowelharmony+"р"+vowelharmony+vowelharmony,("capitalized","instrumental","reflexive")])
+    if(whichIsMarkerYN):
+        for form, flags in inflectionforms(word+"х",reflexiveYN=True):
+            forms.append([form,("which",)+flags])
+    return forms
+
+INFLECTIONFLAGS=("capitalized","negative","reflexive","instrumental","which")
+
+def inflectionmarkup(forms):
+    return ''.join("<idx:infl><idx:iform value=\""+form+"\"/></idx:infl>" for form, _ in forms)
+
 def makeinflection(word,capitalizeYN=True, negativeYN=False,reflexiveYN=False,instrumentalYN=False,whichIsMarkerYN=False):
     #vowelharmony=getvowelharmonyletter(word)
     vowelharmony=getvowelharmonyletter(word)[0]
@@ -287,9 +621,6 @@ def makeinflection(word,capitalizeYN=True, negativeYN=False,reflexiveYN=False,in
                 retval=retval+"<idx:infl><idx:iform value=\""+capitalize(word)+vowelharmony+vowelharmony+"р"+vowelharmony+vowelharmony+"\"/></idx:infl>"
     if(whichIsMarkerYN):
         retval=retval+makeinflection(word+"х",reflexiveYN=True)
-        #retval=retval+"<idx:infl><idx:iform value=\""+word+"х\"/></idx:infl>"
-        #if(capitalizeYN):
-            #retval=retval+"<idx:infl><idx:iform value=\""+capitalize(word)+"х\"/></idx:infl>"        
     return retval
 
 def getvowelharmonyletter(word):
@@ -326,7 +657,11 @@ class MongolianWord:
     PVH=""
     SVH=""
     debugOn=False
-    def __init__(self,word,debugOn=False):
+    record=False #keep forms, only for exporting; the build only needs chain
+    forms=[] #[{form, stem, suffix, modifier, paradigm, voice, case, tense, flags...}]
+    paradigm=None
+    voice=None
+    def __init__(self,word,debugOn=False,record=False):
         self.term=word
         #chain="<idx:orth value=\""+key+"\">"
         self.chain=""
@@ -335,18 +670,35 @@ class MongolianWord:
         self.PVH=self.vowelharmonies[1]
         self.SVH=self.vowelharmonies[2]
         self.debugOn=debugOn
-
-    def buildIt(self,combo,modifier="None",capitalizeYN=True, negativeYN=False,reflexiveYN=False,instrumentalYN=False,whichIsMarkerYN=False): #absorbed as in the vowel before "х" is absorbed
-        modifiedTerm=self.getModifiedTerm(modifier)
+        self.record=record
+        self.forms=[]
+        self.paradigm=None
+        self.voice=None
+
+    #add the forms of word to the chain, with record=True also
+    #keep where they came from in forms
+    def addInflection(self,word,combo="",modifier="None",case=None,tense=None,capitalizeYN=True, negativeYN=False,reflexiveYN=False,instrumentalYN=False,whichIsMarkerYN=False):
         if(self.debugOn):
-            print(modifiedTerm+combo)
-        self.chain=self.chain+makeinflection(modifiedTerm+combo,capitalizeYN=capitalizeYN, negativeYN=negativeYN,reflexiveYN=reflexiveYN,instrumentalYN=instrumentalYN,whichIsMarkerYN=whichIsMarkerYN)
+            print(word)
+        if(not self.record):
+            self.chain=self.chain+makeinflection(word,capitalizeYN=capitalizeYN, negativeYN=negativeYN,reflexiveYN=reflexiveYN,instrumentalYN=instrumentalYN,whichIsMarkerYN=whichIsMarkerYN)
+            return
+        forms=inflectionforms(word,capitalizeYN=capitalizeYN, negativeYN=negativeYN,reflexiveYN=reflexiveYN,instrumentalYN=instrumentalYN,whichIsMarkerYN=whichIsMarkerYN)
+        self.chain=self.chain+inflectionmarkup(forms)
+        for form, flags in forms:
+            record={"form":form,"stem":word,"suffix":combo,"modifier":modifier,
+                    "paradigm":self.paradigm,"voice":self.voice,"case":case,"tense":tense}
+            for flag in INFLECTIONFLAGS:
+                record[flag]=flag in flags
+            self.forms.append(record)
+
+    def buildIt(self,combo,modifier="None",capitalizeYN=True, negativeYN=False,reflexiveYN=False,instrumentalYN=False,whichIsMarkerYN=False,case=None,tense=None): #absorbed as in the vowel before "х" is absorbed
+        modifiedTerm=self.getModifiedTerm(modifier)
+        self.addInflection(modifiedTerm+combo,combo,modifier,case,tense,capitalizeYN=capitalizeYN, negativeYN=negativeYN,reflexiveYN=reflexiveYN,instrumentalYN=instrumentalYN,whichIsMarkerYN=whichIsMarkerYN)
 
-    def buildItVerb(self,combo,modifier="RemoveLast",capitalizeYN=True, negativeYN=False,reflexiveYN=False,instrumentalYN=False,whichIsMarkerYN=False): #absorbed as in the vowel before "х" is absorbed
+    def buildItVerb(self,combo,modifier="RemoveLast",capitalizeYN=True, negativeYN=False,reflexiveYN=False,instrumentalYN=False,whichIsMarkerYN=False,case=None,tense=None): #absorbed as in the vowel before "х" is absorbed
         modifiedTerm=self.getModifiedTerm(modifier)
-        if(self.debugOn):
-            print(modifiedTerm+combo)
-        self.chain=self.chain+makeinflection(modifiedTerm+combo,capitalizeYN=capitalizeYN, negativeYN=negativeYN,reflexiveYN=reflexiveYN,instrumentalYN=instrumentalYN,whichIsMarkerYN=whichIsMarkerYN)
+        self.addInflection(modifiedTerm+combo,combo,modifier,case,tense,capitalizeYN=capitalizeYN, negativeYN=negativeYN,reflexiveYN=reflexiveYN,instrumentalYN=instrumentalYN,whichIsMarkerYN=whichIsMarkerYN)
 
     def conjugateIt(self,combo="",modifier="None",completionMod=False):
         modifiedTerm=self.getModifiedTerm(modifier)
@@ -360,59 +712,59 @@ class MongolianWord:
 
         #gen
         if(dropGenEnd):
-            self.buildIt(combo,modifier,whichIsMarkerYN=True)
+            self.buildIt(combo,modifier,whichIsMarkerYN=True,case="genitive")
         else:
-            self.buildIt(combo+"н",modifier,whichIsMarkerYN=True)
+            self.buildIt(combo+"н",modifier,whichIsMarkerYN=True,case="genitive")
     
         #acc
-        self.buildIt(combo+"г",modifier)
+        self.buildIt(combo+"г",modifier,case="accusative")
 
-    def makeDat(self,combo="д",modifier="None"):
-        self.buildIt(combo,modifier,reflexiveYN=True,instrumentalYN=True)
-        self.buildIt(combo+"л"+self.vowelharmony+self.vowelharmony,modifier)
+    def makeDat(self,combo="д",modifier="None",tense=None):
+        self.buildIt(combo,modifier,reflexiveYN=True,instrumentalYN=True,case="dative",tense=tense)
+        self.buildIt(combo+"л"+self.vowelharmony+self.vowelharmony,modifier,case="dative",tense=tense)
 
     def makeVerbSuffixes(self,combo="",modifier="RemoveLast"):
         #past
         if(self.vowelharmony=="ө"):
-            self.buildIt(combo+"сэн",modifier,negativeYN=True,reflexiveYN=True)
+            self.buildIt(combo+"сэн",modifier,negativeYN=True,reflexiveYN=True,tense="past")
         else: 
-            self.buildIt(combo+"с"+self.vowelharmony+"н",modifier,negativeYN=True,reflexiveYN=True)
+            self.buildIt(combo+"с"+self.vowelharmony+"н",modifier,negativeYN=True,reflexiveYN=True,tense="past")
 
         #future
-        self.buildIt(combo+"н"+self.vowelharmony,modifier)
+        self.buildIt(combo+"н"+self.vowelharmony,modifier,tense="future")
 
-        self.buildIt(combo+"ж",modifier)
+        self.buildIt(combo+"ж",modifier,tense="progressive")
 
         #narrative past
-        self.buildIt(combo+"жээ",modifier)
-        self.buildIt("чээ",modifier)
+        self.buildIt(combo+"жээ",modifier,tense="narrative past")
+        self.buildIt("чээ",modifier,tense="narrative past")
 
-        self.buildIt("ч",modifier)
+        self.buildIt("ч",modifier,tense="narrative past")
 
         #perpetual
-        self.buildItVerb(combo+"д"+self.vowelharmony+"г",modifier,negativeYN=True)
+        self.buildItVerb(combo+"д"+self.vowelharmony+"г",modifier,negativeYN=True,tense="perpetual")
 
         #conditional converb (if __, when __)
         mTermLastLet=self.getModifiedTerm(modifier)[-1]
         if(mTermLastLet=="л" or mTermLastLet=="в"):
-            self.buildItVerb(combo+"б"+self.vowelharmony+"л",modifier)
+            self.buildItVerb(combo+"б"+self.vowelharmony+"л",modifier,tense="conditional")
         else:
-            self.buildItVerb(combo+"в"+self.vowelharmony+"л",modifier)
+            self.buildItVerb(combo+"в"+self.vowelharmony+"л",modifier,tense="conditional")
 
         #no idea what this is
         self.buildItVerb(combo+"т"+self.vowelharmony+"л",modifier)
 
         #intent
-        self.buildItVerb(combo+"м"+self.vowelharmony+self.vowelharmony+"р",modifier) 
+        self.buildItVerb(combo+"м"+self.vowelharmony+self.vowelharmony+"р",modifier,tense="intent")
 
         #recent past
-        self.buildItVerb(combo+"л"+self.vowelharmony+self.vowelharmony,modifier)
+        self.buildItVerb(combo+"л"+self.vowelharmony+self.vowelharmony,modifier,tense="recent past")
 
         #as soon as
-        self.buildItVerb(combo+"м"+self.vowelharmony+"гц",modifier)
+        self.buildItVerb(combo+"м"+self.vowelharmony+"гц",modifier,tense="as soon as")
 
         #action of the main clause has been happening since the action of the sub clause
-        self.buildItVerb(combo+"с"+self.vowelharmony+self.vowelharmony+"р",modifier,negativeYN=True)
+        self.buildItVerb(combo+"с"+self.vowelharmony+self.vowelharmony+"р",modifier,negativeYN=True,tense="since")
 
 
 
@@ -451,34 +803,34 @@ class MongolianWord:
                 stop=True
 
         #build imperative
-        self.buildItVerb("")
+        self.buildItVerb("",tense="imperative")
 
         if(len(term)>impCount+1):
             #buildsourceword=buildsourceword+makeinflection(term[:(-1*(1+impCount))])
-            self.chain=self.chain+makeinflection(term[:(-1*(1+impCount))])
+            self.addInflection(term[:(-1*(1+impCount))],tense="imperative")
 
         #unsure what this is
         self.buildItVerb("г"+vowelharmony+vowelharmony+"д")
 
         #when/while ____
-        self.buildItVerb("х"+vowelharmony+"д")
-        self.makeDat("хд",modifier="RemoveLast")
+        self.buildItVerb("х"+vowelharmony+"д",tense="when")
+        self.makeDat("хд",modifier="RemoveLast",tense="when")
 
         #modified verbs for progressive tense
-        self.buildItVerb("ж")
+        self.buildItVerb("ж",tense="progressive")
         
         #modified verbs for recent past
-        self.buildItVerb("в")
+        self.buildItVerb("в",tense="recent past")
 
         #modified verbs for modal converb
-        self.buildItVerb("н")
+        self.buildItVerb("н",tense="modal converb")
         
         #still dative case?
-        self.makeDat("нд",modifier="RemoveLast")
+        self.makeDat("нд",modifier="RemoveLast",tense="modal converb")
         
         #modified verbs for action verbs
-        self.buildItVerb("л",negativeYN=True)
-        self.makeDat("лт",modifier="RemoveLast")
+        self.buildItVerb("л",negativeYN=True,tense="action")
+        self.makeDat("лт",modifier="RemoveLast",tense="action")
 
         self.buildItVerb(vowelharmony+"гүй")
 
@@ -492,7 +844,7 @@ class MongolianWord:
 
                     #
                     #buildsourceword=buildsourceword+makeinflection(term+vowelharmony+vowelharmony+"д",negativeYN=True,reflexiveYN=True)
-                    self.buildItVerb(vowelharmony+vowelharmony+"д",modifier="None",negativeYN=True,reflexiveYN=True)
+                    self.buildItVerb(vowelharmony+vowelharmony+"д",modifier="None",negativeYN=True,reflexiveYN=True,tense="before")
 
 
             else:
@@ -508,9 +860,9 @@ class MongolianWord:
 
                     if(isMNVowelHarmonyVowel(term[-2]) and not isMNVowel(term[-2])):
                         #action happens before main action
-                        self.buildItVerb(vowelharmony+"д")
+                        self.buildItVerb(vowelharmony+"д",tense="before")
                     else: #term[-3:]=="чих"
-                        self.buildItVerb(vowelharmony+vowelharmony+"д",modifier="Absorbed")
+                        self.buildItVerb(vowelharmony+vowelharmony+"д",modifier="Absorbed",tense="before")
                 else:
 
                 
@@ -525,12 +877,12 @@ class MongolianWord:
 
                         #action happens before main action
                         #buildsourceword=buildsourceword+makeinflection(term[:-1]+vowelharmony+"д")
-                        self.buildItVerb(vowelharmony+"д")
+                        self.buildItVerb(vowelharmony+"д",tense="before")
 
                         if(term[-3]=="г" or term[-3]=="в" or term[-3]=="р"):
                             #take care of exceptions to ч rule
                             #buildsourceword=buildsourceword+makeinflection(term[:-2]+"ч")
-                            self.buildItVerb("ч",modifier="Absorbed")
+                            self.buildItVerb("ч",modifier="Absorbed",tense="narrative past")
                     else:
 
 
@@ -539,15 +891,15 @@ class MongolianWord:
 
                         #action happens before main action
                         #buildsourceword=buildsourceword+makeinflection(term[:-1]+vowelharmony+"д")
-                        self.buildItVerb(vowelharmony+"д")
+                        self.buildItVerb(vowelharmony+"д",tense="before")
                     
 
         
         if(len(term)>2):
             if(vowelharmony=="ө"):
-                self.buildItVerb(vowelharmony+vowelharmony+"рэй",modifier="Absorbed")
+                self.buildItVerb(vowelharmony+vowelharmony+"рэй",modifier="Absorbed",tense="imperative")
             else:
-                self.buildItVerb(vowelharmony+vowelharmony+"р"+vowelharmony+"й",modifier="Absorbed")
+                self.buildItVerb(vowelharmony+vowelharmony+"р"+vowelharmony+"й",modifier="Absorbed",tense="imperative")
             
             #imperative
             #buildsourceword=buildsourceword+makeinflection(term[:-2]+\
@@ -568,231 +920,349 @@ class MongolianWord:
         #if(self.PVH=="а"):
             #buildsourceword=buildsourceword+makeinflection(term[:-2]+"ъя")
             #buildsourceword=buildsourceword+makeinflection(term[:-1]+"ъя")
-            self.buildItVerb("ъя",modifier="Absorbed")
+            self.buildItVerb("ъя",modifier="Absorbed",tense="let's")
         elif(self.term[-2]=="э" or self.term[-2]=="и" or self.term[-2]=="ө" or self.term[-2]=="ү"):
 
             #buildsourceword=buildsourceword+makeinflection(term[:-2]+"ье")
             #buildsourceword=buildsourceword+makeinflection(term[:-1]+"ье")
-            self.buildItVerb("ье",modifier="Absorbed")
+            self.buildItVerb("ье",modifier="Absorbed",tense="let's")
         else:
             #buildsourceword=buildsourceword+makeinflection(term[:-2]+"ъё")
             #buildsourceword=buildsourceword+makeinflection(term[:-1]+"ъё")
 
-            self.buildItVerb("ъё",modifier="Absorbed")
+            self.buildItVerb("ъё",modifier="Absorbed",tense="let's")
 
         self.term=tempStoreTerm # to delete later
         return self.chain
 
-# Write into to the key, definition pairs
-# key -> [[term, defn, key==term]]
-def writekey(to, key, defn):
-    terms = iter(sorted(defn, key=keyf))
-    for term, g in groupby(terms, key=lambda d: d[0]):
+# Verb paradigm, for dictionary forms ending in х
+def conjugateterm(mg, term):
+    vowelharmony, PVH, SVH = getvowelharmonyletter(term) #PVH as in а or э, SVH as in у or ү
+
+    mg.paradigm="verb"
+    mg.voice="active"
+    mg.conjugateIt()
+
+    #complete action
+    if(len(term)>3 and term[-3:]!="чих"):
+        mg.voice="completive"
+        mg.buildItVerb("чих",modifier="Absorbed",negativeYN=True)
+        mg.buildItVerb("чих"+vowelharmony+vowelharmony+"д",modifier="None",negativeYN=True,reflexiveYN=True,tense="before")
+        mg.makeVerbSuffixes("чих",modifier="Absorbed")
+        #buildsourceword=buildsourceword+conjugateverb(term[:-2]+"чих",buildsourceword,completionMod=True)
+
+    #passive voice
+    if(len(term)>2 and term[-5:]!="уулах" and term[-5:]!="үүлэх"):
+        #уулах or үүлэх                    
+        mg.voice="passive"
+        mg.buildIt(SVH+SVH+"л"+PVH+"х",modifier="Absorbed",negativeYN=True)
+        mg.conjugateIt(SVH+SVH+"л"+PVH+"х",modifier="Absorbed")
+
+    #cooperative voice
+    if(len(term)>2 and term[-4:]!="лцах" and term[-4:]!="лцэх"):
+         #лцах or лцэх
+        mg.voice="cooperative"
+        mg.buildIt("лц"+PVH+"х",modifier="RemoveLast",negativeYN=True)
+        mg.makeVerbSuffixes("лц"+PVH+"х")
+
+
+    #no good description on what this is except that it's inherited from Classical Mongolian
+    if(term[-4:]!="лдах" and term[-4:]!="лдэх"):
+        #лдах or лдэх
+        mg.voice="plural"
+        mg.buildIt("лд"+PVH+"х",modifier="RemoveLast",negativeYN=True)
+        mg.makeVerbSuffixes("лд"+PVH+"х")
+        #mg.conjugateIt("лд"+PVH+"х",modifier="RemoveLast")
+        #mg.buildIt("лд"+PVH+"н",modifier="RemoveLast")
+        #buildsourceword=buildsourceword+conjugateverb(term[:-1]+"лдах",buildsourceword)
+
+# Noun paradigm: plurals and cases, also used for adjectives
+def declineterm(mg, term):
+    lastletter=term[-1]
+    vowelharmony, PVH, SVH = getvowelharmonyletter(term) #PVH as in а or э, SVH as in у or ү
+    mg.paradigm="noun"
+    mg.voice=None
+
+    #if consonant
+    if(not isMNVowel(lastletter) and len(term)>1):
+        #plurals for non verbs ууд or үүд
+        if(lastletter=='н'):
+            mg.buildIt("г"+SVH+SVH+"д",modifier="RemoveLast",reflexiveYN=True,instrumentalYN=True,case="plural")
+        else:
+            mg.buildIt(SVH+SVH+"д",reflexiveYN=True,instrumentalYN=True,case="plural")
+
+        #past tense
+        mg.buildIt("с"+vowelharmony+"н",tense="past")
 
-        if(term=="барих"):
-            mg=MongolianWord(term,debugOn=True)
+        #possibly converb? Causes conflicts, commented out
+        #buildsourceword=buildsourceword+makeinflection(term+vowelharmony+"н")
+        if(len(term)>3):
+            mg.buildIt(vowelharmony+"н",tense="converb")
+            mg.buildIt(vowelharmony+"нд",tense="converb")
+
+        #ablative case (from <term>)
+        
+        if(lastletter=="х" or lastletter=="т" or lastletter=="в" or lastletter=="с"):
+            mg.buildIt("н"+vowelharmony+vowelharmony+"с",reflexiveYN=True,case="ablative")
         else:
-            mg = MongolianWord(term)
-        lastletter=term[-1]
-        mg.chain="<idx:orth value=\""+key+"\">"
-        #vowelharmony=""
-        #vowelharmony=getvowelharmonyletter(term)
-        vowelharmonyletters=getvowelharmonyletter(term)
-        vowelharmony=vowelharmonyletters[0]
-        PVH=vowelharmonyletters[1] #as in а or э
-        SVH=vowelharmonyletters[2] #as in у or ү
-        #print(vowelharmony+PVH+SVH)
+            mg.buildIt(vowelharmony+vowelharmony+"с",reflexiveYN=True,case="ablative")
 
-        #negation and capitalize
-        mg.buildIt("",capitalizeYN=True,negativeYN=True,reflexiveYN=True,instrumentalYN=True)
+        #instrumental case
+        #mg.buildIt(vowelharmony+vowelharmony+"р",negativeYN=True)
 
-        #if consonant
-        if(not isMNVowel(lastletter) and len(term)>1):
+        #genitive case + accusitive case
+        if(lastletter=="ж" or lastletter=="ч" or lastletter=="г" or lastletter=="ш" or lastletter=="ь" or lastletter=="к"):   
             
-            #verbs
-            if(lastletter=="х"):
-                mg.conjugateIt()
-
-                #complete action
-                if(len(term)>3 and term[-3:]!="чих"):
-                    mg.buildItVerb("чих",modifier="Absorbed",negativeYN=True)
-                    mg.buildItVerb("чих"+vowelharmony+vowelharmony+"д",modifier="None",negativeYN=True,reflexiveYN=True)
-                    mg.makeVerbSuffixes("чих",modifier="Absorbed")
-                    #buildsourceword=buildsourceword+conjugateverb(term[:-2]+"чих",buildsourceword,completionMod=True)
-
-                #passive voice
-                if(len(term)>2 and term[-5:]!="уулах" and term[-5:]!="үүлэх"):
-                    #уулах or үүлэх                    
-                    mg.buildIt(SVH+SVH+"л"+PVH+"х",modifier="Absorbed",negativeYN=True)
-                    mg.conjugateIt(SVH+SVH+"л"+PVH+"х",modifier="Absorbed")
-
-                #cooperative voice
-                if(len(term)>2 and term[-4:]!="лцах" and term[-4:]!="лцэх"):
-                     #лцах or лцэх
-                    mg.buildIt("лц"+PVH+"х",modifier="RemoveLast",negativeYN=True)
-                    mg.makeVerbSuffixes("лц"+PVH+"х")
-
-
-                #no good description on what this is except that it's inherited from Classical Mongolian
-                if(term[-4:]!="лдах" and term[-4:]!="лдэх"):
-                    #лдах or лдэх
-                    mg.buildIt("лд"+PVH+"х",modifier="RemoveLast",negativeYN=True)
-                    mg.makeVerbSuffixes("лд"+PVH+"х")
-                    #mg.conjugateIt("лд"+PVH+"х",modifier="RemoveLast")
-                    #mg.buildIt("лд"+PVH+"н",modifier="RemoveLast")
-                    #buildsourceword=buildsourceword+conjugateverb(term[:-1]+"лдах",buildsourceword)
+            #gen
+            if(lastletter=="г"):
+                mg.buildIt("гийн",modifier="Absorbed",whichIsMarkerYN=True,case="genitive")
             else:
-                #plurals for non verbs ууд or үүд
-                if(lastletter=='н'):
-                    mg.buildIt("г"+SVH+SVH+"д",modifier="RemoveLast",reflexiveYN=True,instrumentalYN=True)
-                else:
-                    mg.buildIt(SVH+SVH+"д",reflexiveYN=True,instrumentalYN=True)
-
-                #past tense
-                mg.buildIt("с"+vowelharmony+"н")
-
-                #possibly converb? Causes conflicts, commented out
-                #buildsourceword=buildsourceword+makeinflection(term+vowelharmony+"н")
-                if(len(term)>3):
-                    mg.buildIt(vowelharmony+"н")
-                    mg.buildIt(vowelharmony+"нд")
+                mg.makeGenAcc()
+            
+        elif(lastletter=="н"):
+            mg.makeGenAcc(dropGenEnd=True)
+            mg.makeGenAcc("ы",dropGenEnd=True)
+            #gen
+            mg.buildIt("гийн",whichIsMarkerYN=True,case="genitive")
 
-                #ablative case (from <term>)
-                
-                if(lastletter=="х" or lastletter=="т" or lastletter=="в" or lastletter=="с"):
-                    mg.buildIt("н"+vowelharmony+vowelharmony+"с",reflexiveYN=True)
-                else:
-                    mg.buildIt(vowelharmony+vowelharmony+"с",reflexiveYN=True)
+        else:
+            
+            if((lastletter=="р" or lastletter=="г" or lastletter=="с" or lastletter=="л") and isMNVowelHarmonyVowel(term[-2]) and not isMNVowel(term[:-3])):
+                mg.makeGenAcc(modifier="RemoveLastVowel")
+                mg.makeGenAcc("ы",modifier="RemoveLastVowel")
+                mg.buildIt(vowelharmony+vowelharmony+"с",modifier="RemoveLastVowel",reflexiveYN=True,case="ablative")
+            else:
+                mg.makeGenAcc()
+                mg.makeGenAcc("ы")
 
-                #instrumental case
-                #mg.buildIt(vowelharmony+vowelharmony+"р",negativeYN=True)
+        
 
-                #genitive case + accusitive case
-                if(lastletter=="ж" or lastletter=="ч" or lastletter=="г" or lastletter=="ш" or lastletter=="ь" or lastletter=="к"):   
-                    
-                    #gen
-                    if(lastletter=="г"):
-                        mg.buildIt("гийн",modifier="Absorbed",whichIsMarkerYN=True)
-                    else:
-                        mg.makeGenAcc()
-                    
-                elif(lastletter=="н"):
-                    mg.makeGenAcc(dropGenEnd=True)
-                    mg.makeGenAcc("ы",dropGenEnd=True)
-                    #gen
-                    mg.buildIt("гийн",whichIsMarkerYN=True)
+        #dative case
+        if(lastletter=="г" or lastletter=="в" or lastletter=="с" or lastletter=="р" or lastletter=="к"):
+            mg.makeDat("т")
+        elif(lastletter=="д" or lastletter=="т" or lastletter=="з" or lastletter=="ц"):
+            mg.makeDat(vowelharmony+"д")
+        elif(lastletter=="ж" or lastletter=="ч" or lastletter=="ш"):
+            mg.makeDat("ид")
+        else:
+            mg.makeDat()
 
-                else:
-                    
-                    if((lastletter=="р" or lastletter=="г" or lastletter=="с" or lastletter=="л") and isMNVowelHarmonyVowel(term[-2]) and not isMNVowel(term[:-3])):
-                        mg.makeGenAcc(modifier="RemoveLastVowel")
-                        mg.makeGenAcc("ы",modifier="RemoveLastVowel")
-                        mg.buildIt(vowelharmony+vowelharmony+"с",modifier="RemoveLastVowel",reflexiveYN=True)
-                    else:
-                        mg.makeGenAcc()
-                        mg.makeGenAcc("ы")
+        #exceptions for dative case
+        if(lastletter=="л" or lastletter=="н"):
+            mg.makeDat("т")
 
-                
+    #ends in vowel
+    else:
+        mg.makeGenAcc("гий")
 
-                #dative case
-                if(lastletter=="г" or lastletter=="в" or lastletter=="с" or lastletter=="р" or lastletter=="к"):
-                    mg.makeDat("т")
-                elif(lastletter=="д" or lastletter=="т" or lastletter=="з" or lastletter=="ц"):
-                    mg.makeDat(vowelharmony+"д")
-                elif(lastletter=="ж" or lastletter=="ч" or lastletter=="ш"):
-                    mg.makeDat("ид")
-                else:
-                    mg.makeDat()
+        #past tense
+        mg.buildIt("с"+vowelharmony+"н",tense="past")
 
-                #exceptions for dative case
-                if(lastletter=="л" or lastletter=="н"):
-                    mg.makeDat("т")
+        #possibly converb?
+        mg.buildIt("н",tense="converb")
+        mg.buildIt("нд",tense="converb")
 
+        mg.buildIt("ч")
 
+        #ablative case (from <term>)
+        mg.buildIt("н"+vowelharmony+vowelharmony+"с",reflexiveYN=True,case="ablative")
+        mg.buildIt(vowelharmony+"с",reflexiveYN=True,case="ablative")
         
-            
-        #ends in vowel
-        else:
-            mg.makeGenAcc("гий")
-
-            #past tense
-            mg.buildIt("с"+vowelharmony+"н")
+        #instrumental case
+        mg.buildIt("г"+vowelharmony+vowelharmony+"р",case="instrumental")
+        mg.buildIt(vowelharmony+"р",case="instrumental")
 
-			#possibly converb?
-            mg.buildIt("н")
-            mg.buildIt("нд")
-
-            mg.buildIt("ч")
-
-			#ablative case (from <term>)
-            mg.buildIt("н"+vowelharmony+vowelharmony+"с",reflexiveYN=True)
-            mg.buildIt(vowelharmony+"с",reflexiveYN=True)
-            
-            #instrumental case
-            mg.buildIt("г"+vowelharmony+vowelharmony+"р")
-            mg.buildIt(vowelharmony+"р")
-
-            #accusative case
-            mg.buildIt("г")
-            mg.buildIt("г"+vowelharmony+vowelharmony) # with reflexive
-            
-            #dative case
-            mg.makeDat()
-            mg.makeDat("т")
-            
-            #figure out what this is later
-            mg.buildIt("д"+vowelharmony+vowelharmony)
-
-            #genitive case
-            if(lastletter=="й"):
-                mg.buildIt("н",whichIsMarkerYN=True)
-            #long vowel
-            elif(len(term)>1 and term[-2]==lastletter):            
-                mg.buildIt("ны")
-                mg.buildIt("ний")
-
-            #single vowel at end
-            if(len(term)>1 and not isMNVowel(term[-2])):
-
-                mg.buildIt("ны")
-                mg.buildIt("ын",whichIsMarkerYN=True)
-                mg.buildIt("ийн",whichIsMarkerYN=True)
-            #plurals
-            mg.buildIt("н"+SVH+SVH+"д",reflexiveYN=True,instrumentalYN=True)
-
-        #dimunitives (like shortened names)
-        mg.buildIt("х"+vowelharmony+"н")
+        #accusative case
+        mg.buildIt("г",case="accusative")
+        mg.buildIt("г"+vowelharmony+vowelharmony,case="accusative") # with reflexive
         
-        #reflexive + other
-        if(len(term)>3 and lastletter=="р" and not isMNVowel(term[-3])):
-            mg.buildIt(vowelharmony+vowelharmony,modifier="RemoveLastVowel")
-        else:
-            mg.buildIt(vowelharmony+vowelharmony)
+        #dative case
+        mg.makeDat()
+        mg.makeDat("т")
+        
+        #figure out what this is later
+        mg.buildIt("д"+vowelharmony+vowelharmony)
+
+        #genitive case
+        if(lastletter=="й"):
+            mg.buildIt("н",whichIsMarkerYN=True,case="genitive")
+        #long vowel
+        elif(len(term)>1 and term[-2]==lastletter):            
+            mg.buildIt("ны",case="genitive")
+            mg.buildIt("ний",case="genitive")
+
+        #single vowel at end
+        if(len(term)>1 and not isMNVowel(term[-2])):
+
+            mg.buildIt("ны",case="genitive")
+            mg.buildIt("ын",whichIsMarkerYN=True,case="genitive")
+            mg.buildIt("ийн",whichIsMarkerYN=True,case="genitive")
+        #plurals
+        mg.buildIt("н"+SVH+SVH+"д",reflexiveYN=True,instrumentalYN=True,case="plural")
+
+# Suffixes added to every verb and noun
+def commonsuffixes(mg, term):
+    lastletter=term[-1]
+    vowelharmony, PVH, SVH = getvowelharmonyletter(term) #PVH as in а or э, SVH as in у or ү
+    mg.paradigm="common"
+    mg.voice=None
+
+    #dimunitives (like shortened names)
+    mg.buildIt("х"+vowelharmony+"н",case="diminutive")
+    
+    #reflexive + other
+    if(len(term)>3 and lastletter=="р" and not isMNVowel(term[-3])):
+        mg.buildIt(vowelharmony+vowelharmony,modifier="RemoveLastVowel",case="reflexive")
+    else:
+        mg.buildIt(vowelharmony+vowelharmony,case="reflexive")
 
-		#add suffix -тай
-        if(vowelharmony=="ө"):
-            mg.buildIt("тэй")
-        else:
-            mg.buildIt("т"+vowelharmony+"й")
+    #add suffix -тай
+    if(vowelharmony=="ө"):
+        mg.buildIt("тэй",case="comitative")
+    else:
+        mg.buildIt("т"+vowelharmony+"й",case="comitative")
+
+# Is term a dictionary form the verb paradigm can conjugate
+def isverbterm(term):
+    return len(term)>1 and term[-1]=="х"
+
+# Paradigm for each part of speech tag a definition starts with,
+# None for the words that are only written as they are
+PARADIGMS = {
+    "v.": conjugateterm,
+    "n.": declineterm,
+    "adj.": declineterm,
+    "adv.": None,
+    "pron.": None,
+    "prep.": None,
+    "conj.": None,
+    "conjunc.": None,
+    "interj.": None,
+    "art.": None,
+    "phrase.": None,
+}
+
+# Part of speech tag at the start of a definition, like v. or adj.
+# None if the definition has no tag
+POSTAG = re.compile(r'\s*([A-Za-z?]+\.)')
+def parsepos(defn):
+    m = POSTAG.match(defn)
+    if m: return m.group(1).lower()
+    return None
+
+# The paradigms to run for term given the part of speech
+# tags of its definitions. Without a known tag fall back
+# to guessing from the ending: verbs end in х.
+def paradigmsfor(term, pos=()):
+    known = [PARADIGMS[p] for p in pos if p in PARADIGMS]
+    if not known:
+        if isverbterm(term): return [conjugateterm]
+        return [declineterm]
+
+    paradigms = []
+    for paradigm in known:
+        if paradigm is None or paradigm in paradigms: continue
+        if paradigm is conjugateterm and not isverbterm(term): continue
+        paradigms.append(paradigm)
+    return paradigms
+
+# Build the inflection markup for term, filed under key:
+# <idx:orth value="key"> followed by every generated
+# <idx:infl> form, closed with </idx:orth>.
+# pos are the part of speech tags of the term's definitions.
+# Returns the MongolianWord, its markup is in .chain and, with
+# record=True, where each form came from in .forms
+def inflectterm(key, term, pos=(), record=False):
+    mg = MongolianWord(term, debugOn=(VERBOSE and term=="барих"), record=record)
+    mg.chain="<idx:orth value=\""+key+"\">"
+
+    #negation and capitalize
+    mg.buildIt("",capitalizeYN=True,negativeYN=True,reflexiveYN=True,instrumentalYN=True)
+
+    paradigms = paradigmsfor(term, pos)
+    for paradigm in paradigms:
+        paradigm(mg, term)
+    if paradigms:
+        commonsuffixes(mg, term)
+
+    #unsure what this is (I think it's dative plus reflexive, taken care of above)
+    #buildsourceword=buildsourceword+makeinflection(term+"д"+vowelharmony+vowelharmony)
+
+    #end        
+    mg.chain=mg.chain+"</idx:orth>"
+    return mg
+
+# Pull the generated iform values back out of a chain,
+# in order and without repeats
+IFORM = re.compile(r'<idx:iform value="([^"]*)"/>')
+def iforms(chain):
+    return list(dict.fromkeys(IFORM.findall(chain)))
+
+# Forms generated and kept by pruneforms, lower cased,
+# for the coverage report
+GENERATED = set()
+KEPT = set()
+
+# Drop the forms of a chain that occur fewer than MINFREQ
+# times in CORPUS, keeping at most FORMBUDGET of the most
+# frequent ones. The term itself is always kept.
+INFL = re.compile(r'<idx:infl><idx:iform value="([^"]*)"/></idx:infl>')
+def pruneforms(chain, term):
+    forms = list(dict.fromkeys(f.lower() for f in iforms(chain)))
+    keep = [f for f in forms if CORPUS.get(f, 0) >= MINFREQ and f != term.lower()]
+    if FORMBUDGET > 0:
+        keep = sorted(keep, key=lambda f: -CORPUS[f])[:max(FORMBUDGET-1, 0)]
+    keep = set(keep)
+    keep.add(term.lower())
+
+    GENERATED.update(forms)
+    KEPT.update(keep)
+    return INFL.sub(lambda m: m.group(0) if m.group(1).lower() in keep else '', chain)
+
+# How many corpus tokens the generated and the kept forms match
+def coverage():
+    generated = sum(CORPUS.get(f, 0) for f in GENERATED)
+    kept = sum(CORPUS.get(f, 0) for f in KEPT)
+    return len(GENERATED), len(KEPT), generated, kept
+
+# Group the definitions of a key by term, in keyf order
+# Yields term, [[term, defn, key==term, pos]...]
+def termgroups(defn):
+    terms = iter(sorted(defn, key=keyf))
+    for term, g in groupby(terms, key=lambda d: d[0]):
+        yield term, list(g)
 
-        #unsure what this is (I think it's dative plus reflexive, taken care of above)
-        #buildsourceword=buildsourceword+makeinflection(term+"д"+vowelharmony+vowelharmony)
+# The part of speech tags of a term's definitions, in order
+def termpos(g):
+    return tuple(dict.fromkeys(d[3] for d in g if d[3]))
 
-        #end        
-        mg.chain=mg.chain+"</idx:orth>"
+# Write into to the key, definition pairs
+# key -> [[term, defn, key==term, pos]]
+# chains: (key, term, pos) -> inflection markup already made
+# by inflectterm, shared by builds of the same headwords
+def writekey(to, key, defn, chains=None):
+    for term, g in termgroups(defn):
+
+        pos = termpos(g)
+        if chains is not None and (key, term, pos) in chains:
+            chain = chains[key, term, pos]
+        else:
+            chain = inflectterm(key, term, pos).chain
+        if CORPUS is not None:
+            chain = pruneforms(chain, term)
         to.write(
 """
       <idx:entry name="word" scriptable="yes">
         <h2>
 """
-          +mg.chain+
+          +chain+
           term+"<br/>"+
           #<idx:orth value="{key}">{term}</idx:orth>
 """
         </h2>
 """.format(term=term, key=key))
 
-        to.write('; '.join(ndefn for _, ndefn, _ in g))
+        to.write('; '.join(ndefn for _, ndefn, _, _ in g))
         to.write(
 """
       </idx:entry>
@@ -802,28 +1272,32 @@ def writekey(to, key, defn):
     if VERBOSE: print(key)
 
 # Write all the keys, where defns is a map of
-# key --> [[term, defn, key==term]...]
+# key --> [[term, defn, key==term, pos]...]
 # and name is the basename
 # The files are split so that there are no more than
 # 10,000 keys written to each file (why?? I dunno)
 #
 # Returns the number of files.
-def writekeys(defns, name):
+def writekeys(defns, name, chains=None):
     keyit = iter(sorted(defns))
     for j in count():
         with writekeyfile(name, j) as to:
             keys = list(islice(keyit, 10000))
             if len(keys) == 0: break
             for key in keys:
-                writekey(to, key, defns[key])
+                writekey(to, key, defns[key], chains)
     return j+1
 
 # After writing keys, the opf that references all the key files
 # is constructed.
 # openopf wraps the contents of writeopf
+# source and target are the dictionary languages,
+# INLANG and OUTLANG by default
 #
 @contextmanager
-def openopf(ndicts, name):
+def openopf(ndicts, name, source=None, target=None):
+    if source is None: source = INLANG
+    if target is None: target = OUTLANG
     fname = "%s.opf" % name
     if VERBOSE: print("Opf: {}".format(fname))
     #with open(fname, 'w') as to:
@@ -851,7 +1325,7 @@ def openopf(ndicts, name):
 
 <!-- list of all the files needed to produce the .prc file -->
 <manifest>
-""".format(name=name, source=INLANG, target=OUTLANG))
+""".format(name=name, source=source, target=target))
 
         yield to
 
@@ -863,8 +1337,8 @@ def openopf(ndicts, name):
 )
 
 # Write the opf that describes all the key files
-def writeopf(ndicts, name):
-    with openopf(ndicts, name) as to:
+def writeopf(ndicts, name, source=None, target=None):
+    with openopf(ndicts, name, source, target) as to:
         for i in range(ndicts):
             to.write(
 """     <item id="dictionary{ndict}" href="{name}{ndict}.html" media-type="text/x-oeb1-document"/>
@@ -889,10 +1363,54 @@ def writeopf(ndicts, name):
 # main
 ######################################################
 
-print("Reading keys")
-defns = readkeys()
-name = os.path.splitext(os.path.basename(FILENAME))[0]
-print("Writing keys")
-ndicts = writekeys(defns, name)
-print("Writing opf")
-writeopf(ndicts, name)
+def main():
+    global VERBOSE, FILENAME, MODULE, INLANG, OUTLANG, JOBS
+    global CORPUS, MINFREQ, FORMBUDGET
+    args = parseargs()
+    VERBOSE  = args.verbose
+    FILENAME = args.file[0]
+    MODULE   = args.module
+    INLANG   = args.source
+    OUTLANG  = args.target
+    JOBS     = args.jobs
+    MINFREQ  = args.min_freq
+    FORMBUDGET = args.form_budget
+    importmod()
+
+    if args.corpus:
+        from corpusfreq import countcorpus
+        print("Counting {}".format(args.corpus))
+        CORPUS = countcorpus(args.corpus, JOBS)
+
+    print("Reading keys")
+    if len(args.file) > 1:
+        defns = readsources(args.file, args.priority, args.conflict)
+    else:
+        defns = readkeys()
+    name = os.path.splitext(os.path.basename(FILENAME))[0]
+
+    words = None
+    if args.words is not None: words = args.words.split(",")
+    if args.words_file is not None:
+        with io.open(args.words_file, 'r', encoding='utf-8') as fr:
+            words = (words or []) + [w for w in fr if w.strip()]
+    preview = (args.letters, args.match, words, args.sample)
+    if any(p is not None for p in preview):
+        defns = selectkeys(defns, *preview, seed=args.seed)
+        name = name + "_preview"
+        print("Previewing {} keys".format(len(defns)))
+
+    print("Writing keys")
+    ndicts = writekeys(defns, name)
+    print("Writing opf")
+    writeopf(ndicts, name)
+
+    if CORPUS is not None:
+        ngen, nkept, tgen, tkept = coverage()
+        total = sum(CORPUS.values()) or 1
+        print("Kept {} of {} forms".format(nkept, ngen))
+        print("Corpus tokens matched: {} ({:.1%}) before, {} ({:.1%}) after pruning".format(
+            tgen, tgen/total, tkept, tkept/total))
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,5 @@
 #!/usr/bin/env python3
-import tab2opfhelper
\ No newline at end of file
+import tab2opfhelper
+
+if __name__ == "__main__":
+    tab2opfhelper.main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Run with: python3 -m pytest test_tab2opfhelper.py
+
+import io
+import argparse
+import hashlib
+import os
+
+import pytest
+
+import tab2opfhelper
+from tab2opfhelper import readkeys, readchunks
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# A source with keys repeated across chunks, comments,
+# blank lines and \r\n line ends
+def writesource(path):
+    with io.open(os.path.join(HERE, "MoToEng.txt"), 'r', encoding='utf-8') as fr:
+        lines = fr.read().splitlines()[:400]
+    with io.open(path, 'w', encoding='utf-8', newline='') as to:
+        for i in range(3):
+            to.write("# pass {}\r\n\n".format(i))
+            for line in lines:
+                to.write(line + ("\r\n" if i == 1 else "\n"))
+    return str(path)
+
+def test_readchunks_same_as_line_by_line(tmp_path):
+    fname = writesource(tmp_path / "src.txt")
+    assert readchunks(fname, 2, chunksize=4096) == readkeys(fname, jobs=1)
+
+def test_readkeys_single_worker_reads_in_process(tmp_path, monkeypatch):
+    fname = writesource(tmp_path / "src.txt")
+    monkeypatch.setattr(tab2opfhelper, "READCHUNK", 1024)
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    def nopool(*args, **kwargs):
+        raise AssertionError("readchunks used with one worker")
+    monkeypatch.setattr(tab2opfhelper, "readchunks", nopool)
+    assert readkeys(fname) == readkeys(fname, jobs=1)
+
+def test_readsources_single_worker_reads_in_process(tmp_path, monkeypatch):
+    a = writesource(tmp_path / "a.txt")
+    b = writesource(tmp_path / "b.txt")
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    def nopool(*args, **kwargs):
+        raise AssertionError("Pool used with one worker")
+    monkeypatch.setattr(tab2opfhelper, "Pool", nopool)
+    defns = tab2opfhelper.readsources([a, b], conflict="first")
+    assert defns == readkeys(a, jobs=1)
+
+def test_parselines_plugin_result_count_checked(monkeypatch):
+    monkeypatch.setattr(tab2opfhelper, "getkeys", lambda keys: keys[:-1])
+    with pytest.raises(Exception, match="getkeys"):
+        tab2opfhelper.parselines(["бар\tn. tiger", "барих\tv. to hold"])
+
+def test_readsources_fewer_files_than_workers_reads_chunked(tmp_path, monkeypatch):
+    a = writesource(tmp_path / "a.txt")
+    b = writesource(tmp_path / "b.txt")
+    expected = tab2opfhelper.readsources([a, b], jobs=1)
+    monkeypatch.setattr(tab2opfhelper, "READCHUNK", 1024)
+    chunked = []
+    def readchunks(filename, jobs=None):
+        chunked.append(filename)
+        return readkeys(filename, jobs=1)
+    monkeypatch.setattr(tab2opfhelper, "readchunks", readchunks)
+    assert tab2opfhelper.readsources([a, b], jobs=4) == expected
+    assert chunked == [a, b]
+
+# [term, defn, key==term, pos] entries for the merge tests
+def entry(term, defn):
+    return [term, defn, True, None]
+
+def test_mergekey_all_keeps_every_definition():
+    high = [entry("бар", "n. tiger")]
+    low = [entry("бар", "n. tiger"), entry("бар", "n. print")]
+    assert tab2opfhelper.mergekey([high, low], "all") == high + low
+
+def test_mergekey_concat_keeps_each_definition_once():
+    high = [entry("бар", "n. tiger")]
+    low = [entry("бар", "N. Tiger"), entry("бар", "n. print"), entry("Бар", "n. tiger")]
+    assert tab2opfhelper.mergekey([high, low], "concat") == \
+        [entry("бар", "n. tiger"), entry("бар", "n. print"), entry("Бар", "n. tiger")]
+
+def test_mergekey_first_keeps_highest_priority():
+    high = [entry("бар", "n. tiger")]
+    low = [entry("бар", "n. print")]
+    assert tab2opfhelper.mergekey([high, low], "first") == high
+
+def test_rankfiles_orders_by_priority():
+    assert tab2opfhelper.rankfiles(["a", "b", "c"]) == ["a", "b", "c"]
+    assert tab2opfhelper.rankfiles(["a", "b", "c"], [1, 3, 2]) == ["b", "c", "a"]
+    # ties keep the order given
+    assert tab2opfhelper.rankfiles(["a", "b", "c"], [1, 2, 2]) == ["b", "c", "a"]
+
+def test_mergesources_uses_rank_order():
+    high = [("бар", [entry("бар", "n. tiger")]), ("ус", [entry("ус", "n. water")])]
+    low = [("бар", [entry("бар", "n. print")]), ("үс", [entry("үс", "n. hair")])]
+    defns = tab2opfhelper.mergesources([high, low], "first")
+    assert defns == {"бар": [entry("бар", "n. tiger")],
+                     "ус": [entry("ус", "n. water")],
+                     "үс": [entry("үс", "n. hair")]}
+    defns = tab2opfhelper.mergesources([low, high], "all")
+    assert defns["бар"] == [entry("бар", "n. print"), entry("бар", "n. tiger")]
+
+def test_letterrange():
+    assert tab2opfhelper.letterrange("а-в") == "абв"
+    assert tab2opfhelper.letterrange("Ө") == "ө"
+    for bad in ["в-а", "a-в", "аб-в"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            tab2opfhelper.letterrange(bad)
+
+def test_countcorpus_single_worker_counts_in_process(tmp_path, monkeypatch):
+    import corpusfreq
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("Барих барих ус\nус 12 ус_\n" * 200, encoding="utf-8")
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    def nopool(*args, **kwargs):
+        raise AssertionError("Pool used with one worker")
+    monkeypatch.setattr(corpusfreq, "Pool", nopool)
+    counts = corpusfreq.countcorpus(str(corpus), chunksize=100)
+    assert counts == {"барих": 400, "ус": 600}
+
+# The part of speech dispatch of inflectterm
+
+def basechain(term):
+    # what inflectterm writes before any paradigm
+    mg = tab2opfhelper.MongolianWord(term)
+    mg.buildIt("", capitalizeYN=True, negativeYN=True, reflexiveYN=True, instrumentalYN=True)
+    return "<idx:orth value=\"{}\">{}</idx:orth>".format(term, mg.chain)
+
+def test_pron_term_gets_no_case_forms():
+    assert tab2opfhelper.paradigmsfor("тэр", ("pron.",)) == []
+    chain = tab2opfhelper.inflectterm("тэр", "тэр", ("pron.",)).chain
+    assert chain == basechain("тэр")
+    assert "тэрийн" not in tab2opfhelper.iforms(chain)
+
+def test_noun_ending_in_x_is_declined_not_conjugated():
+    assert tab2opfhelper.paradigmsfor("цох", ("n.",)) == [tab2opfhelper.declineterm]
+    forms = tab2opfhelper.iforms(tab2opfhelper.inflectterm("цох", "цох", ("n.",)).chain)
+    verbforms = tab2opfhelper.iforms(tab2opfhelper.inflectterm("цох", "цох", ("v.",)).chain)
+    assert "цохууд" in forms and "цохууд" not in verbforms
+    # verb forms are made from the stem without х
+    assert "цож" in verbforms and "цож" not in forms
+    assert not any(f.lower() in ("цо", "ц") for f in forms)
+
+def test_verb_tag_without_x_gets_no_paradigm():
+    assert tab2opfhelper.paradigmsfor("хот", ("v.",)) == []
+    assert tab2opfhelper.inflectterm("хот", "хот", ("v.",)).chain == basechain("хот")
+
+# md5 of the chains the ending heuristic wrote for untagged
+# terms before the dispatch (8099508)
+UNTAGGED = {
+    "барих": "f94cc527041f1d4a97f37b1a963e0476",
+    "явах": "0d7582bd2f7bed44d6c81189bd359a50",
+    "цох": "66e78f67d2d3390980905b0567309a40",
+    "хот": "d7c449cc7c241d1a72c22d7952a26c02",
+    "гэр": "5f3de85abadab2bf366c5e9405e794e0",
+    "морь": "87160edb655bbdfac99846614f26b234",
+    "хүү": "826052af990c98fed912b6e6a371d29c",
+    "а": "e9432bd7e478a99272b0e8b06f530a36",
+}
+
+@pytest.mark.parametrize("term", sorted(UNTAGGED))
+def test_untagged_term_uses_ending_heuristic(term):
+    chain = tab2opfhelper.inflectterm(term, term).chain
+    assert hashlib.md5(chain.encode("utf-8")).hexdigest() == UNTAGGED[term]